@@ -1,10 +1,13 @@
 from __future__ import annotations
 
-import json
+import itertools
 import math
+import os
+import time
 import random
 from pathlib import Path
 
+import numpy as np
 from kivy.app import App
 from kivy.clock import Clock
 from kivy.core.window import Window
@@ -15,8 +18,13 @@ from kivy.uix.relativelayout import RelativeLayout
 from kivy.uix.screenmanager import Screen, ScreenManager, FadeTransition
 from kivy.uix.scrollview import ScrollView
 from kivy.uix.gridlayout import GridLayout
+from kivy.uix.progressbar import ProgressBar
 
-from main import MainWidget
+from imslib.core import get_task_pool, call_on_main_thread
+from level_loader import LevelCache, warm_up_audio
+from profiler import Profiler, PROFILE_DIR_ENV
+from persistence import DebouncedWriter
+from constants import PRACTICE_SPEEDS, FIRST_FRAME_ENV, FIRST_FRAME_MARKER
 
 PALETTE = {
     "bg": (0.05, 0.05, 0.08),
@@ -26,18 +34,56 @@ PALETTE = {
     "accent2": (1.0, 0.35, 0.35),
 }
 FONT_NAME      = "fonts/UbuntuMono-B.ttf"
-METADATA_FILES  = {'Iron':Path("level_data/iron/level_metadata.json"), 'Awakening':Path("level_data/zelda/level_metadata.json")}
 
-def load_levels() -> dict[str, dict]:
-    out = {}
-    for i in METADATA_FILES:
-        if METADATA_FILES[i].exists():
-            out.update(json.loads(METADATA_FILES[i].read_text()))
-    return out
-    raise FileNotFoundError(f"Missing")
+# scores and run history live in the player's profile database; the metadata files only
+# describe the levels (their scores are used to seed a new profile). The database and the
+# level index are opened by BeatBlitzApp.build(), not on import
 
+def _load_scores(store, levels: dict):
+    store.seed_levels(levels)
+    scores = store.get_level_scores()
+    for name, meta in levels.items():
+        if name in scores:
+            meta["high_score"], meta["stars_collected"] = scores[name]
+
+def load_levels(store, index) -> dict[str, dict]:
+    levels, _ = index.scan()
+    _load_scores(store, levels)
+    return levels
+
+def refresh_levels(store, levels: dict, found: dict):
+    """
+    Updates `levels` in place (the screens share it) with the levels found by a rescan:
+    adds new ones, drops removed ones and picks up edited metadata, keeping the scores of
+    levels already loaded.
+    """
+    new = {name: meta for name, meta in found.items() if name not in levels}
+    _load_scores(store, new)
+    for name in [name for name in levels if name not in found]:
+        del levels[name]
+    for name, meta in found.items():
+        if name in new:
+            levels[name] = meta
+        else:
+            meta["high_score"], meta["stars_collected"] = levels[name]["high_score"], levels[name]["stars_collected"]
+            levels[name].clear()
+            levels[name].update(meta)
+
+# scores and finished runs are written on a background thread (see BeatBlitzApp.profile_writer)
 def save_levels(levels: dict, level):
-    METADATA_FILES[level].write_text(json.dumps(levels, indent=4))
+    meta = levels[level]
+    App.get_running_app().profile_writer.save(("scores", level), (meta["high_score"], meta["stars_collected"]))
+
+def save_run(level, score, stars, speed, stats):
+    app = App.get_running_app()
+    app.profile_writer.save(("run", next(app.run_ids)), (level, score, stars, speed, stats, time.time()))
+
+def flush_levels(wait: bool = False):
+    App.get_running_app().profile_writer.flush(wait)
+
+# levels prepared in the background, e.g. as soon as they are selected
+LEVEL_CACHE = LevelCache(max_levels=3)
+AUDIO_WARMED_UP = False   # audio is loaded in the background once the level list is shown
 
 class RetroLabel(Label):
     def __init__(self, **kw):
@@ -80,11 +126,26 @@ class HomeScreen(Screen):
             Color(*PALETTE["bg"]); self._bg = Rectangle(size=Window.size)
         Window.bind(size=lambda *_: self._resize_bg())   # keep bg full‑screen
         with self.canvas:
-            self.polys = []; rnd = random.choice
+            self.polys = []; poly_pts = []; rnd = random.choice
             for _ in range(40):
                 Color(*(rnd((PALETTE["accent_on"], PALETTE["accent2"])) + (0.25,)))
-                self.polys.append(Line(points=self._rand_poly(), width=1.5))
-        Clock.schedule_interval(self._animate, 1/30)
+                poly_pts.append(self._rand_poly())
+                self.polys.append(Line(points=poly_pts[-1], width=1.5))
+        # every polygon's vertices as (x, y) rows; polygon i is rows offsets[i]:offsets[i+1]
+        self.poly_pts = np.array([p for pts in poly_pts for p in pts], dtype=float).reshape(-1, 2)
+        self.poly_offsets = np.cumsum([0] + [len(pts) // 2 for pts in poly_pts])
+
+        # only animate while this screen is showing (see on_enter / on_leave)
+        self._anim_event = Clock.schedule_interval(self._animate, 1/30)
+
+    def on_enter(self, *_):
+        if self._anim_event is None:
+            self._anim_event = Clock.schedule_interval(self._animate, 1/30)
+
+    def on_leave(self, *_):
+        if self._anim_event is not None:
+            self._anim_event.cancel()
+            self._anim_event = None
 
     def _resize_bg(self):
         self._bg.size = Window.size
@@ -97,12 +158,12 @@ class HomeScreen(Screen):
         return pts + pts[:2]
 
     def _animate(self, *_):
-        for ln in self.polys:
-            pts = ln.points
-            for i in range(0, len(pts), 2):
-                pts[i] = (pts[i]+.3) % Window.width
-                pts[i+1] = (pts[i+1]+.3) % Window.height
-            ln.points = pts
+        pts = self.poly_pts
+        pts += .3
+        pts %= (Window.width, Window.height)
+        offsets = self.poly_offsets
+        for i, ln in enumerate(self.polys):
+            ln.points = pts[offsets[i]:offsets[i + 1]].ravel().tolist()
 
 # ─────────────────────────────── 5.  HOW-TO SCREEN ───────────────────────────────────
 HOW_TO_TEXT = (
@@ -158,25 +219,75 @@ class LevelSelectScreen(Screen):
                                      pos_hint={"right": .95, "y": .05}, disabled=True)
         self.start_btn.bind(on_release=self._start_level); root.add_widget(self.start_btn)
 
+        # practice mode: cycle through slower playback speeds
+        self.speed = PRACTICE_SPEEDS[0]
+        self.speed_btn = RetroButton(text=self._speed_text(), size_hint=(.3, .08),
+                                     pos_hint={"right": .95, "y": .16})
+        self.speed_btn.bind(on_release=self._cycle_speed); root.add_widget(self.speed_btn)
+
         howto_btn = RetroButton(text="HOW  TO  PLAY", size_hint=(.3, .1),
                                 pos_hint={"x": .02, "y": .05})
         howto_btn.bind(on_release=self._go_to_howto)
         root.add_widget(howto_btn)
 
         # populate buttons
-        for name in self.levels:
-            btn = RetroButton(text=name, size_hint_y=None, height=60)
-            btn.bind(on_release=lambda btn, nm=name: self._select(nm))
-            self.grid.add_widget(btn)
+        self.level_btns = {}
+        self._sync_level_btns()
 
         with self.canvas.before:
             Color(*PALETTE["bg"]); Rectangle(size=Window.size)
 
         self.selected: str | None = None
 
+    def on_enter(self, *_):
+        # pick up levels installed (or edited) since the list was last shown
+        get_task_pool().submit(App.get_running_app().level_index.scan, on_done=self._on_scanned,
+                               on_error=lambda e: print("ERROR : could not scan levels :", e))
+
+        # nothing needs audio until a level starts: get it ready while the player picks one
+        global AUDIO_WARMED_UP
+        if not AUDIO_WARMED_UP:
+            AUDIO_WARMED_UP = True
+            get_task_pool().submit(warm_up_audio,
+                                   on_error=lambda e: print("INFO : could not warm up audio :", e))
+
+    def _on_scanned(self, result):
+        found, changed = result
+        if not changed:
+            return
+        refresh_levels(App.get_running_app().profile_store, self.levels, found)
+        self._sync_level_btns()
+        if self.selected is not None:
+            if self.selected in self.levels:
+                self._select(self.selected)     # its metadata may have changed
+            else:
+                self.selected = None
+                self.info.text = ""
+                self.start_btn.disabled = True
+
+    def _sync_level_btns(self):
+        for name in [name for name in self.level_btns if name not in self.levels]:
+            self.grid.remove_widget(self.level_btns.pop(name))
+        for name in self.levels:
+            if name not in self.level_btns:
+                btn = RetroButton(text=name, size_hint_y=None, height=60)
+                btn.bind(on_release=lambda btn, nm=name: self._select(nm))
+                self.grid.add_widget(btn)
+                self.level_btns[name] = btn
+
     def _go_to_howto(self, *_):
         self.manager.current = "howto"
 
+    def _speed_text(self):
+        if self.speed == 1.0:
+            return "SPEED  100%"
+        return f"PRACTICE  {round(self.speed * 100)}%"
+
+    def _cycle_speed(self, *_):
+        i = PRACTICE_SPEEDS.index(self.speed)
+        self.speed = PRACTICE_SPEEDS[(i + 1) % len(PRACTICE_SPEEDS)]
+        self.speed_btn.text = self._speed_text()
+
     def _select(self, name: str):
         self.selected = name; meta = self.levels[name]
         self.info.text = (
@@ -188,11 +299,15 @@ class LevelSelectScreen(Screen):
         )
         self.start_btn.disabled = False
 
+        # the player will probably start it: get it ready in the background. The SoundFont is
+        # only loaded once it is started, so browsing the list doesn't load a bank per click
+        get_task_pool().submit(LEVEL_CACHE.get, meta["level_file"], meta["song_base_path"], load_audio=False,
+                               on_error=lambda e: print("INFO : could not prefetch", name, ":", e))
+
     def _start_level(self, *_):
         if not self.selected:   return
         meta = self.levels[self.selected]
-        self.manager.get_screen("game").load_level(self.selected, meta)
-        self.manager.current = "game"
+        self.manager.get_screen("loading").load(self.selected, meta, self.speed)
 
 # ───────────────────────── END‑OF‑LEVEL (results) SCREEN ─────────────────────────
 class EndOfLevelScreen(Screen):
@@ -245,8 +360,9 @@ class EndOfLevelScreen(Screen):
     # ------------------------------------------------------------------
     #  Public API  – GameScreen calls this to populate results
     # ------------------------------------------------------------------
-    def load_results(self, level_name: str, score: int):
+    def load_results(self, level_name: str, score: int, speed: float = 1.0, stats: dict | None = None):
         self.level_name = level_name
+        self.speed = speed
         meta = self.levels[level_name]
         stars = ScoreBoard._stars(score, meta["max_score"])
         self.info.text = (
@@ -256,26 +372,34 @@ class EndOfLevelScreen(Screen):
             f"Difficulty : [color=#ff5555]{meta['difficulty']}[/color]\n"
             f"Song : {Path(meta['song_title']).name}"
         )
+        save_run(level_name, score, stars, speed, stats)
+
+        # practice runs don't count towards high scores
+        if speed != 1.0:
+            self.info.text += f"\nPractice : {round(speed * 100)}%"
+            flush_levels()
+            return
+
         # update persistent metadata if better
         if score > meta["high_score"]:
             meta["high_score"] = score
         if stars > meta["stars_collected"]:
             meta["stars_collected"] = stars
         save_levels(App.get_running_app().levels,self.level_name)
+        flush_levels()
 
     def _replay(self, *_):
-        game = self.manager.get_screen("game")
-        game.load_level(self.level_name, self.levels[self.level_name])
-        self.manager.current = "game"
+        self.manager.get_screen("loading").load(self.level_name, self.levels[self.level_name], self.speed)
 
     def _to_levels(self, *_):
         self.manager.current = "levels"
 
 
 class ScoreBoard(RetroLabel):
-    def __init__(self, level_name: str, display, meta, **kw):
+    def __init__(self, level_name: str, world, meta, speed: float = 1.0, **kw):
         super().__init__(font_size="18sp", halign="left",**kw)
-        self.lvl_name, self.display, self.meta = level_name, display, meta
+        self.lvl_name, self.world, self.meta = level_name, world, meta
+        self.speed = speed
         Clock.schedule_interval(self._refresh, .1)
         self.size_hint = (None, None)
         self.width = 500
@@ -289,17 +413,19 @@ class ScoreBoard(RetroLabel):
         self.pos =(20, Window.height-120)
 
     def _refresh(self, *_):
-        score = self.display.score
+        score = self.world.score
         max_sc = self.meta["max_score"]
-        streak_text = f"Streak: {self.display.streak}"
-        if self.display.streak>=3:
+        streak_text = f"Streak: {self.world.streak}"
+        if self.world.streak>=3:
             streak_text += f"  [color=#ff5555]ON FIRE!!![/color]"
         self.text = (
             f"Score : {score}/{max_sc}\n"
             f"{streak_text}\n"
             f"Stars : {self._stars(score, max_sc)}"
         )
-        if score > self.meta["high_score"]:
+        if self.speed != 1.0:
+            self.text += f"\n[color=#ff5555]PRACTICE {round(self.speed * 100)}%[/color]"
+        elif score > self.meta["high_score"]:
             self.meta["high_score"] = score
             save_levels(App.get_running_app().levels,self.lvl_name)
 
@@ -315,7 +441,8 @@ class CommandOverlay(RetroLabel):
         "jump GREEN : [b][2][/b]\n"
         "jump BLUE : [b][3][/b]\n\n"
         "restart : [b][r][/b]\n"
-        "quit : [b][q][/b]"
+        "quit : [b][q][/b]\n"
+        "profiler : [b][p][/b]"
     )
     def __init__(self, **kw):
         super().__init__(text=self._TXT, font_size="18sp",
@@ -327,6 +454,104 @@ class CommandOverlay(RetroLabel):
         self.texture_update()
         self.pos = (Window.width - 210, Window.height-170)
 
+class ProfilerOverlay(RetroLabel):
+    """
+    Shows the profiler's rolling p50 / p95 / p99 section times, audio CPU and the number of
+    obstacles on screen. Only refreshes (and only profiles) while shown.
+    """
+    def __init__(self, profiler, game_widget, **kw):
+        super().__init__(font_size="14sp", halign="right", valign="top", **kw)
+        self.profiler, self.game_widget = profiler, game_widget
+        self._event = None
+        self.opacity = 0
+        Window.bind(size=self._reposition)
+        self._reposition()
+
+    def _reposition(self, *_):
+        self.texture_update()
+        self.size = self.texture_size
+        self.pos = (Window.width - self.width - 10, Window.height - 200 - self.height)
+
+    def show(self):
+        self.profiler.enable()
+        self.opacity = 1
+        if self._event is None:
+            self._event = Clock.schedule_interval(self._refresh, .25)
+        self._refresh()
+
+    def hide(self):
+        self.profiler.disable()
+        self.opacity = 0
+        if self._event is not None:
+            self._event.cancel()
+            self._event = None
+
+    def toggle(self):
+        self.hide() if self.profiler.enabled else self.show()
+
+    def _refresh(self, *_):
+        lines = [f"{'ms':<18}{'p50':>6}{'p95':>6}{'p99':>6}"]
+        for section, stats in self.profiler.get_stats().items():
+            p50, p95, p99 = stats or (0, 0, 0)
+            lines.append(f"{section:<18}{p50:6.2f}{p95:6.2f}{p99:6.2f}")
+        lines.append(f"{'audio cpu':<18}{self.game_widget.audio_ctrl.audio.get_cpu_load():6.2f}")
+        lines.append(f"{'obstacles':<18}{self.game_widget.display.get_num_visible_obstacles():6d}")
+        self.text = "\n".join(lines)
+        self._reposition()
+
+class LoadingScreen(Screen):
+    """
+    Prepares a level on a background thread (files, obstacle model, instruments; see
+    level_loader.py) while showing its progress, then starts it on the game screen.
+    """
+    def __init__(self, **kw):
+        super().__init__(name="loading", **kw)
+        root = RelativeLayout(); self.add_widget(root)
+        self.title = RetroLabel(text="", font_size="32sp", pos_hint={"center_x": .5, "center_y": .6})
+        root.add_widget(self.title)
+        self.bar = ProgressBar(max=1.0, value=0, size_hint=(.5, None), height=30,
+                               pos_hint={"center_x": .5, "center_y": .5})
+        root.add_widget(self.bar)
+        self.status = RetroLabel(text="", font_size="18sp", pos_hint={"center_x": .5, "center_y": .42})
+        root.add_widget(self.status)
+        with self.canvas.before:
+            Color(*PALETTE["bg"]); Rectangle(size=Window.size)
+
+        self._request = 0   # results of older requests are ignored
+
+    def load(self, name: str, meta: dict, speed: float = 1.0):
+        self._request += 1
+        request = self._request
+        self.title.text = f"[b]{name}[/b]"
+        self._on_progress(request, 0, "")
+        self.manager.current = "loading"
+
+        def progress(fraction, text):   # called on the loading thread
+            call_on_main_thread(self._on_progress, request, fraction, text)
+
+        get_task_pool().submit(LEVEL_CACHE.get, meta["level_file"], meta["song_base_path"], progress, take_synth=True,
+                               on_done=lambda prepared: self._on_loaded(request, name, meta, speed, prepared),
+                               on_error=lambda e: self._on_failed(request, name, e))
+
+    def _on_progress(self, request, fraction, text):
+        if request == self._request:
+            self.bar.value = fraction
+            self.status.text = text
+
+    def _on_loaded(self, request, name, meta, speed, prepared):
+        if request != self._request:
+            prepared.release()   # its synth was handed to us; nobody else will use it
+            return
+        # the rest (graphics, audio stream) has to be created on the main thread
+        self.manager.get_screen("game").load_level(name, meta, speed, prepared)
+        self.manager.current = "game"
+
+    def _on_failed(self, request, name, exc):
+        if request != self._request:
+            return
+        print("ERROR : could not load", name, ":", exc)
+        self.manager.current = "levels"
+
 class GameScreen(Screen):
     def __init__(self, **kw):
         super().__init__(name="game", **kw)
@@ -336,6 +561,9 @@ class GameScreen(Screen):
         self.game_widget: MainWidget | None = None
         self.scoreboard : ScoreBoard | None = None
         self.cmd_overlay: CommandOverlay | None = None
+        self.profiler_overlay: ProfilerOverlay | None = None
+        self.profiling = False  # kept on across restarts
+        self.speed = 1.0
 
         self.levels = App.get_running_app().levels
 
@@ -343,19 +571,22 @@ class GameScreen(Screen):
         self._bg.size = Window.size
 
     def end_level(self):
+        self._close_profiler()
+        flush_levels()
         if self.game_widget:
-            self.game_widget.audio_ctrl.stop()
-            self.game_widget.level_has_ended = True
-            self.game_widget.dead = True
-            #self.game_widget.audio_ctrl = None
+            self.game_widget.save_recording()
+            self.game_widget.close()
 
         self.clear_widgets()
 
-    def load_level(self, name: str, meta: dict):
+    def load_level(self, name: str, meta: dict, speed: float = 1.0, prepared=None):
+        from main import MainWidget     # the game and its audio stack load on first play
+
         self.clear_widgets()
-        self.game_widget = MainWidget(name, meta["level_file"], meta["song_base_path"], self.manager)
+        self.speed = speed
+        self.game_widget = MainWidget(name, meta["level_file"], meta["song_base_path"], self.manager, speed, prepared)
         self.add_widget(self.game_widget)
-        self.scoreboard = ScoreBoard(name, self.game_widget.display, meta,
+        self.scoreboard = ScoreBoard(name, self.game_widget.world, meta, speed,
                                      size_hint=(None, None),
                                      pos=(110, Window.height-120))
         self.add_widget(self.scoreboard)
@@ -363,16 +594,56 @@ class GameScreen(Screen):
                                      pos=(Window.width - 210, Window.height-170))
         self.add_widget(self.cmd_overlay)
 
+        profiler = Profiler()
+        world = self.game_widget.world
+        # scrolling itself is one addition; its real cost is GameDisplay.draw moving the world
+        # layer and building / recycling obstacle chunks as they come on screen
+        profiler.watch(self.game_widget.display, "draw", "scroll + chunks")
+        profiler.watch(world, "check_collisions")
+        profiler.watch(self.game_widget.player_ctrl, "on_update")
+        profiler.watch(self.game_widget.audio_ctrl, "on_update")
+        profiler.watch_render(Window)
+        profiler.watch(self.scoreboard, "_refresh")
+        self.profiler_overlay = ProfilerOverlay(profiler, self.game_widget, size_hint=(None, None))
+        self.add_widget(self.profiler_overlay)
+        if self.profiling:
+            self.profiler_overlay.show()
+
+    def on_leave(self, *_):
+        # the level finished (or was quit); stop profiling it and silence it
+        self._close_profiler()
+        if self.game_widget:
+            self.game_widget.close()
+
+    def _close_profiler(self):
+        if not self.profiler_overlay:
+            return
+        profile_dir = os.environ.get(PROFILE_DIR_ENV)
+        profiler = self.profiler_overlay.profiler
+        if profile_dir and profiler.log:
+            name = f"{self.game_widget.level_name}-{time.strftime('%Y%m%d-%H%M%S')}.csv"
+            path = profiler.dump_csv(os.path.join(profile_dir, name.replace(" ", "_")))
+            print("INFO : saved profile to", path)
+        self.profiler_overlay.hide()
+        self.profiler_overlay = None
+
     def on_key_down(self, keycode, modifiers):
         if keycode == 113: #  113 == "q"\
             #end the level
             self.end_level()
             self.manager.current = "home"
             return
+        if keycode == 112: # 112 == "p"
+            if self.profiler_overlay:
+                self.profiler_overlay.toggle()
+                self.profiling = self.profiler_overlay.profiler.enabled
+            return
         if keycode == 114: # 114 == "r"
             #add the level
             self.end_level()
-            self.load_level(self.game_widget.level_name, self.levels[self.game_widget.level_name])
+            name = self.game_widget.level_name
+            self.manager.get_screen("loading").load(name, self.levels[name], self.speed)
+            return
         if self.game_widget:
             self.game_widget.on_key_down(["", keycode], modifiers)
 
@@ -385,17 +656,47 @@ class BeatBlitzApp(App):
 
     def build(self):
         Window.clearcolor = PALETTE["bg"]
-        self.levels = load_levels()             # shared across screens
+        # imported and opened here rather than on import, so importing app (e.g. for the
+        # startup benchmark) doesn't touch the player's database
+        from profile_store import ProfileStore
+        from level_index import LevelIndex
+
+        self.profile_store = ProfileStore()
+        self.level_index = LevelIndex(store=self.profile_store)
+        # scores and runs are written on a background thread, at most every couple of seconds
+        self.profile_writer = DebouncedWriter(self._write_profile, min_interval=2.0)
+        self.run_ids = itertools.count()
+        self.levels = load_levels(self.profile_store, self.level_index)   # shared across screens
 
         sm = ScreenManager(transition=FadeTransition())
         sm.add_widget(HomeScreen())
         sm.add_widget(LevelSelectScreen())
         sm.add_widget(HowToPlayScreen())
+        sm.add_widget(LoadingScreen())
         sm.add_widget(GameScreen())
         sm.add_widget(EndOfLevelScreen())
         Window.bind(on_key_down=self._dispatch_down, on_key_up=self._dispatch_up)
+        if os.environ.get(FIRST_FRAME_ENV):
+            Window.bind(on_flip=self._on_first_frame)
         return sm
 
+    def _on_first_frame(self, *_):
+        # startup_benchmark.py times how long it takes to get here
+        Window.unbind(on_flip=self._on_first_frame)
+        print(FIRST_FRAME_MARKER, flush=True)
+        self.stop()
+
+    def on_stop(self):
+        self.profile_writer.close()
+        self.profile_store.close()
+
+    def _write_profile(self, key, value):
+        # runs on the profile writer's thread
+        if key[0] == "scores":
+            self.profile_store.set_level_scores(key[1], *value)
+        else:
+            self.profile_store.add_run(*value)
+
     def _dispatch_down(self, win, keycode, scancode, txt, modifiers):
         scr = self.root.current_screen
         if hasattr(scr, "on_key_down"):
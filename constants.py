@@ -4,6 +4,12 @@ JUMP_STRENGTH = 800    # upward velocity when jumping
 GRAVITY       = -2500   # downward acceleration
 GROUND_HEIGHT = 200    # the baseline for the player to stand
 PLAYER_DEATH_TIMEOUT = 0.5 # the time (in seconds) that a player is dead for
+CHUNK_SLICES  = 16       # obstacles are drawn in static meshes of this many slices
+PHYSICS_STEP  = 1 / 240.0 # fixed physics timestep (seconds), independent of the frame rate
+MAX_FRAME_TIME = 0.25   # longest frame the physics will catch up on, so a stall can't snowball
+PRACTICE_SPEEDS = (1.0, 0.9, 0.8, 0.7, 0.6, 0.5) # playback speeds offered by practice mode
+FIRST_FRAME_ENV    = "BEATBLITZ_EXIT_AFTER_FIRST_FRAME" # if set, the game quits after drawing one frame (see startup_benchmark.py)
+FIRST_FRAME_MARKER = "FIRST FRAME"   # printed by the game when it does
 COLOR_MAP = {
     1: (1, 0, 0),   # key "1" => red
     2: (0, 1, 0),   # key "2" => green
@@ -0,0 +1,283 @@
+from level_model import CTYPE_TOP, CTYPE_BOTTOM, CTYPE_SIDE, CTYPE_SPIKE
+from constants import GROUND_HEIGHT, GRAVITY, COLOR_MAP, SCROLL_SPEED, SLICE_WIDTH, JUMP_STRENGTH, PLAYER_DEATH_TIMEOUT
+from constants import PHYSICS_STEP, MAX_FRAME_TIME
+
+# ---------------------------------------------------------
+#  GAME WORLD
+# ---------------------------------------------------------
+class GameWorld(object):
+    """
+    The game simulation, without any graphics (GameDisplay in game.py draws it), so it can
+    also run headless, e.g. to replay a recording.
+
+    - Maintains player motion (x,y) with gravity
+    - Distinguishes side/spike collision => death vs.
+      top collision => stand or bottom collision => head-bump
+    - Only allows jumps when on ground or on top of an obstacle
+
+    :param model: The level's LevelModel.
+    :param audio: The AudioController (or a stand-in) to notify of deaths and jumps.
+    :param on_level_end: Optional ``on_level_end()``, called once the player clears the level.
+    """
+    def __init__(self, model, audio, speed = 1.0, on_level_end = None):
+        super(GameWorld, self).__init__()
+
+        self.model = model
+        self.audio = audio
+        self.speed = speed    # < 1.0 in practice mode: the whole simulation runs slower, with the audio
+        self.scroll_speed = SCROLL_SPEED
+        self.on_level_end = on_level_end
+
+        self.scroll_x = 0
+
+        # player
+        self.player_size = 40
+        self.player_x = 200
+        self.player_y = GROUND_HEIGHT
+        self.player_vel_y = 0
+        self.is_on_something = True  # starts on ground
+        self.color_under_player = None # starts with no color under the player
+        self.player_color_key = 1
+        self.player_rgb = COLOR_MAP[self.player_color_key]
+
+        # physics state at the start of the last step, for render interpolation (see GameDisplay.draw)
+        self.prev_scroll_x = self.scroll_x
+        self.prev_player_y = self.player_y
+
+        # dead state
+        self.dead = False
+        self.time_since_last_death = 0
+
+        # end of level state
+        self.level_has_ended = False
+
+        # scoring
+        self.score  = 0
+        self.streak = 0
+        self.deaths = 0
+
+    def update_player_color(self, color_key):
+        self.player_color_key = color_key
+        self.player_rgb = COLOR_MAP.get(color_key, (0.5, 0.5, 0.5))
+
+    def scroll_world(self, dt):
+        self.scroll_x += self.scroll_speed * dt
+
+    def on_update(self, dt):
+        """
+        Advances the simulation by one step of `dt` seconds (of real time).
+        """
+        if self.level_has_ended:
+            return
+
+        # slowing time as a whole (not just the scroll) keeps jumps as long, measured in
+        # slices, as at full speed, so every level can still be cleared in practice mode
+        dt *= self.speed
+
+        self.prev_scroll_x = self.scroll_x
+        self.prev_player_y = self.player_y
+
+        # Check if player should be ressurected
+        self.time_since_last_death += dt
+        if self.dead and self.time_since_last_death > PLAYER_DEATH_TIMEOUT:
+            self.ressurected()
+
+        if self.dead:
+            self.scroll_world(dt)
+            return
+
+        # scroll
+        self.scroll_world(dt)
+
+        # apply gravity
+        self.player_vel_y += GRAVITY * dt
+        old_y = self.player_y
+        self.player_y += self.player_vel_y * dt
+
+        # handle floor
+        if self.player_y < GROUND_HEIGHT:
+            self.player_y = GROUND_HEIGHT
+            self.player_vel_y = 0
+            self.is_on_something = True
+        else:
+            self.is_on_something = False  # We'll set to True if we land on top of an obstacle
+
+        # collision check
+        self.check_collisions(old_y)
+
+        # ─────────────── level‑complete test ───────────────
+        # Last obstacle's *right* edge in world‑space
+        last_edge = (self.model.slice_idx[-1] + 1) * SLICE_WIDTH
+        # Player’s front edge position in world‑space
+        player_world_x = self.scroll_x + self.player_x + self.player_size
+        if player_world_x >= last_edge + 500 and not self.dead and not self.level_has_ended:
+            self.level_has_ended = True
+            if self.on_level_end:
+                self.on_level_end()
+
+    def check_collisions(self, old_y):
+        px, py = self.player_x, self.player_y
+        psize  = self.player_size
+        vy     = self.player_vel_y
+
+        # broadphase: only the (at most two) slices under the player can collide
+        player_world_x = self.scroll_x + px
+        hits = self.model.indices_in(player_world_x, player_world_x + psize)
+        ctypes, top_ys = self.model.classify(player_world_x, py, psize, vy, hits)
+
+        color_under_player = None
+        for i, ctype in enumerate(ctypes):
+            if ctype == CTYPE_SPIKE or ctype == CTYPE_SIDE:
+                # immediate death
+                self.died()
+                return True
+            elif ctype == CTYPE_TOP:
+                # land on top => set player bottom to that top
+                self.player_y = float(top_ys[i])
+                self.player_vel_y = 0
+                self.is_on_something = True
+                color_under_player = self.model.color_of(hits.start + i)
+            elif ctype == CTYPE_BOTTOM:
+                # bump head => push player down a bit
+                # e.g., set the player's top to obstacle bottom
+                # (which means player's bottom = obstacle bottom - psize)
+                new_top = float(top_ys[i])
+                self.player_y = new_top - psize
+                self.player_vel_y = 0
+                # not "on_something" from below
+            # else 'none' => do nothing
+
+        self.color_under_player = color_under_player
+
+        return False
+
+    def died(self):
+
+        # If already dead, don't do anything new
+        if self.dead:
+            return
+
+        self.dead = True
+        self.time_since_last_death = 0
+        self.player_y = GROUND_HEIGHT
+        self.score -= 10
+        self.streak = 0
+        self.deaths += 1
+        self.audio.death_callback()
+
+        # color the player gray to indicate death
+        self.player_rgb = (0.2, 0.2, 0.2)
+
+    def ressurected(self):
+
+        if self.check_collisions(self.player_y):
+            print("INFO : Can't ressurect because there is an obstacle in the way, waiting...")
+            return
+
+        self.dead = False
+        self.audio.ressurection_callback()
+
+         # color the player white to indicate back to lift
+        self.player_rgb = (1, 1, 1)
+
+
+    def correct_jump(self):
+        self.streak += 1
+        if self.streak>=3:
+            self.score += 30
+        else:
+            self.score += 10
+
+    def incorrect_jump(self):
+        self.score -= 5
+        self.streak = 0
+
+# ---------------------------------------------------------
+#  FIXED TIMESTEP
+# ---------------------------------------------------------
+class FixedTimestep(object):
+    """
+    Splits variable frame times into a whole number of fixed physics steps, so the simulation
+    behaves the same at any frame rate. Time left over is carried to the next frame, and
+    `alpha` (0..1) is how far the current frame is into the next step, for GameDisplay.draw.
+    """
+    def __init__(self, step = PHYSICS_STEP, max_frame_time = MAX_FRAME_TIME):
+        self.step = step
+        self.max_frame_time = max_frame_time
+        self.accumulator = 0.0
+        self.alpha = 0.0
+
+    def advance(self, frame_dt):
+        """
+        Returns the number of physics steps to run for a frame that took `frame_dt` seconds.
+        """
+        # clamp long frames (e.g. window drags, loading hitches); otherwise catching up makes
+        # the next frame slower still
+        self.accumulator += min(frame_dt, self.max_frame_time)
+
+        steps = 0
+        while self.accumulator >= self.step:
+            self.accumulator -= self.step
+            steps += 1
+
+        self.alpha = self.accumulator / self.step
+        return steps
+
+# ---------------------------------------------------------
+#  PLAYER CONTROLLER
+# ---------------------------------------------------------
+class PlayerController(object):
+    """
+    - Only jumps if 'is_on_something' is true
+    - Checks color correctness
+    """
+    def __init__(self, world, audio):
+        self.world = world
+        self.audio = audio
+
+        self.key_held = None
+
+    def on_key_down(self, keycode):
+        if keycode[1] in ['1','2','3']:
+            self.key_held = int(keycode[1])
+
+    def on_key_up(self, keycode):
+        if keycode[1] in ['1','2','3']:
+            self.key_held = None
+
+    def on_update(self, dt):
+
+        # Can do nothing if dead
+        if self.world.dead:
+            return
+
+        if self.key_held:
+            self.attempt_jump(self.key_held)
+
+    def attempt_jump(self, color_key):
+        # can only jump if on something
+        if not self.world.is_on_something:
+            return
+
+        # apply upward velocity
+        self.world.player_vel_y = JUMP_STRENGTH
+        # TODO: add 180 degree jump rotation
+
+        # check color correctness
+        color_key_under_player = next( # maps the color of the obstacle to the color key
+            (
+                k for k, v in COLOR_MAP.items()
+                if list(v) == self.world.color_under_player
+            ),
+        None)
+
+        tick_num = int(self.world.scroll_x / SLICE_WIDTH)
+        if color_key == color_key_under_player:
+            self.world.correct_jump()
+            self.audio.correct_jump_callback(color_key, tick_num )
+        elif color_key_under_player is not None:
+            self.world.incorrect_jump()
+            self.audio.incorrect_jump_callback(color_key, tick_num)
+
+        # update color to the newly pressed key
+        self.world.update_player_color(color_key)
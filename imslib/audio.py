@@ -115,7 +115,7 @@ class Audio(object):
         """
         Sets a Generator object that must supply audio data to Audio. Generator must define the
         method ``generate(num_frames, num_channels)``, which returns a numpy array of
-        length *(num_frames * num_channels)*.
+        length *(num_frames * num_channels)*, or ``None`` for a silent buffer.
 
         :param gen: The generator object. May be `None`.
 
@@ -164,6 +164,10 @@ class Audio(object):
         if self.generator and num_frames != 0:
             (data, continue_flag) = self.generator.generate(num_frames, self.num_channels)
 
+            # None means the generator was silent for this buffer
+            if data is None:
+                data = np.zeros(num_frames * self.num_channels, dtype=np.float32)
+
             # make sure we got the correct number of frames that we requested
             assert len(data) == num_frames * self.num_channels, \
                 "asked for (%d * %d) frames but got %d" % (num_frames, self.num_channels, len(data))
@@ -186,15 +190,27 @@ class Audio(object):
             a = 0.9
             self.cpu_time = a * self.cpu_time + (1-a) * dt
 
-    def _close(self):
+    def close(self):
+        """
+        Stops and closes the audio streams. Call when done with this `Audio` object (it is also
+        called on exit). `on_update` must not be called afterwards. Calling it again does nothing.
+        """
+        if self.stream is None:
+            return
+
         self.stream.stop_stream()
         self.stream.close()
+        self.stream = None
         if self.input_stream:
             self.input_stream.stop_stream()
             self.input_stream.close()
+            self.input_stream = None
 
         self.audio.terminate()
 
+    def _close(self):
+        self.close()
+
     # look for the ASIO devices and return them (output, input)
     def _find_asio_devices(self):
         out_dev = in_dev = None
@@ -264,6 +280,17 @@ def print_audio_devices():
     for d in devs['input']:
         print('{index:>5}: {name:<40} {channels:<6} {latency[0]:.3f} - {latency[1]:.3f}'.format(**d))
 
+g_warm_pyaudio = None
+def warm_up():
+    """
+    Initializes PortAudio ahead of the first :class:`Audio` object (which is slow on some systems),
+    so that creating it later is fast. Can be called from a background thread, and more than once.
+    PortAudio then stays initialized until the program exits.
+    """
+    global g_warm_pyaudio
+    if g_warm_pyaudio is None:
+        g_warm_pyaudio = pyaudio.PyAudio()
+
 
 if __name__ == "__main__":
     print_audio_devices()
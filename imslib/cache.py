@@ -0,0 +1,16 @@
+#####################################################################
+#
+# This software is to be used for MIT's class Interactive Music Systems only.
+# Since this file may contain answers to homework problems, you MAY NOT release it publicly.
+#
+#####################################################################
+
+import os
+import pathlib
+
+
+def get_cache_dir():
+    """
+    :returns: The directory where imslib caches downloaded and derived files (``~/.ims``).
+    """
+    return os.path.join(str(pathlib.Path.home()), '.ims')
@@ -308,6 +308,7 @@ class AudioScheduler(object):
 
         self.generator = None
         self.cur_frame = 0
+        self.silent = True
 
     def set_generator(self, gen):
         """
@@ -327,10 +328,12 @@ class AudioScheduler(object):
         :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
 
         :returns: A tuple ``(output, True)``. The output is a numpy array of length
-            **(num_frames * num_channels)**
+            **(num_frames * num_channels)**, or ``None`` if the generator was silent
+            for the whole buffer.
         """
         output = np.empty(num_channels * num_frames, dtype = float)
         o_idx = 0
+        self.silent = True
 
         # the current period of time goes from self.cur_frame to end_frame
         end_frame = self.cur_frame + num_frames
@@ -351,19 +354,24 @@ class AudioScheduler(object):
 
         self._generate_until(end_frame, num_channels, output, o_idx)
 
+        if self.silent:
+            return None, True
         return output, True
 
     # generate audio from self.cur_frame to to_frame
     def _generate_until(self, to_frame, num_channels, output, o_idx):
         num_frames = to_frame - self.cur_frame
         if num_frames > 0:
+            data = None
             if self.generator:
                 data, cont = self.generator.generate(num_frames, num_channels)
-            else:
-                data = np.zeros(num_channels * num_frames, dtype=float)
 
             next_o_idx = o_idx+(num_channels * num_frames)
-            output[o_idx : next_o_idx] = data
+            if data is None:
+                output[o_idx : next_o_idx] = 0
+            else:
+                output[o_idx : next_o_idx] = data
+                self.silent = False
             self.cur_frame += num_frames
             return next_o_idx
         else:
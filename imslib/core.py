@@ -14,6 +14,7 @@ from kivy.app import App
 from kivy.clock import Clock
 from kivy.core.window import Window
 from kivy.uix.widget import Widget
+from concurrent.futures import ThreadPoolExecutor
 import traceback
 
 
@@ -148,6 +149,71 @@ def run(widget, in_corner=False, fullscreen=False):
         t()
 
 
+def call_on_main_thread(func, *args, **kwargs):
+    """
+    Calls ``func(*args, **kwargs)`` on the main (Kivy) thread at the next clock tick. Safe to
+    call from any thread.
+    """
+    Clock.schedule_once(lambda _dt: func(*args, **kwargs))
+
+
+class TaskPool(object):
+    """
+    Runs functions on a small pool of background threads, and delivers their results back on
+    the Kivy clock, so the callbacks can safely touch widgets and graphics.
+
+    :param num_workers: the number of background threads.
+    """
+    def __init__(self, num_workers = 2):
+        super(TaskPool, self).__init__()
+        self.executor = ThreadPoolExecutor(max_workers=num_workers, thread_name_prefix='TaskPool')
+
+    def submit(self, func, *args, on_done = None, on_error = None, **kwargs):
+        """
+        Runs ``func(*args, **kwargs)`` on a background thread.
+
+        :param on_done: called on the main thread with the return value of `func`.
+
+        :param on_error: called on the main thread with the exception if `func` raises. If not
+            given, the traceback is printed.
+
+        :returns: a `concurrent.futures.Future` for the call.
+        """
+        future = self.executor.submit(func, *args, **kwargs)
+        future.add_done_callback(lambda f: call_on_main_thread(self._deliver, f, on_done, on_error))
+        return future
+
+    def shutdown(self, wait = False):
+        """
+        Stops accepting tasks. Tasks that have not started are cancelled.
+        """
+        self.executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _deliver(self, future, on_done, on_error):
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is None:
+            if on_done:
+                on_done(future.result())
+        elif on_error:
+            on_error(exc)
+        else:
+            traceback.print_exception(type(exc), exc, exc.__traceback__)
+
+
+g_task_pool = None
+def get_task_pool():
+    """
+    :returns: the shared `TaskPool`, created on first use.
+    """
+    global g_task_pool
+    if g_task_pool is None:
+        g_task_pool = TaskPool()
+        register_terminate_func(g_task_pool.shutdown)
+    return g_task_pool
+
+
 def lookup(k, keys, values):
     """
     Look up a key in a list of keys, and returns the corresponding item from the values list.
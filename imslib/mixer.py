@@ -16,6 +16,7 @@ class Mixer(object):
     def __init__(self):
         super(Mixer, self).__init__()
         self.generators = []
+        self.gen_index = {}  # generator -> its position in self.generators
         self.gain = 0.25
 
     def add(self, gen):
@@ -23,23 +24,30 @@ class Mixer(object):
         Adds a generator to Mixer. Generator must define the method
         ``generate(num_frames, num_channels)``, which returns a tuple
         ``(signal, continue_flag)``. The signal must be a numpy array of
-        length *(num_frames * num_channels)*. The continue_flag should
+        length *(num_frames * num_channels)*, or ``None`` if the generator is
+        silent for this buffer. The continue_flag should
         be a boolean indicating whether the generator has more audio to generate.
 
         :param gen: The generator object.
         """
 
-        if gen not in self.generators:
+        if gen not in self.gen_index:
+            self.gen_index[gen] = len(self.generators)
             self.generators.append(gen)
 
     def remove(self, gen):
         """
-        Removes generator from Mixer.
+        Removes generator from Mixer. Order of the remaining generators is not preserved.
 
         :param gen: The generator object to remove.
         """
 
-        self.generators.remove(gen)
+        # swap the last generator into the removed slot, so removal is O(1)
+        idx = self.gen_index.pop(gen)
+        last = self.generators.pop()
+        if last is not gen:
+            self.generators[idx] = last
+            self.gen_index[last] = idx
 
     def set_gain(self, gain):
         """
@@ -66,26 +74,29 @@ class Mixer(object):
         :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
 
         :returns: A tuple ``(output, True)``. The output is the sum of the outputs of
-            all added generators.
+            all added generators, or ``None`` if every generator was silent.
         """
 
-        output = np.zeros(num_frames * num_channels)
+        output = None
 
         # this calls generate() for each generator. generator must return:
         # (signal, keep_going). If keep_going is True, it means the generator
         # has more to generate. False means generator is done and will be
-        # removed from the list. signal must be a numpay array of length
-        # num_frames * num_channels
-        kill_list = []
-        for g in self.generators:
+        # removed from the list. signal must be a numpy array of length
+        # num_frames * num_channels, or None if the generator is silent.
+        # iterate backwards so that swap-removing the current generator only
+        # moves an already-visited generator into its slot.
+        for i in range(len(self.generators) - 1, -1, -1):
+            g = self.generators[i]
             (signal, keep_going) = g.generate(num_frames, num_channels)
-            output += signal
+            if signal is not None:
+                if output is None:
+                    output = np.array(signal, dtype=float)
+                else:
+                    output += signal
             if not keep_going:
-                kill_list.append(g)
+                self.remove(g)
 
-        # remove generators that are done
-        for g in kill_list:
-            self.generators.remove(g)
-
-        output *= self.gain
+        if output is not None:
+            output *= self.gain
         return (output, True)
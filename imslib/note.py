@@ -22,12 +22,43 @@ def midi_to_frequency(n):
 
     return 440.0 * pow(kTRT, (n - 69))
 
+# number of samples in one cycle of a wavetable
+kWavetableSize = 2048
+
+# wavetables, keyed by (timbre, number of harmonics)
+g_wavetables = {}
+
+def get_wavetable(timbre, func, harmonics, freq):
+    """
+    Returns a single-cycle table of a timbre, band-limited for a given frequency: harmonics that
+    would lie above the Nyquist frequency are left out. Tables are computed once and shared.
+
+    :param timbre: The name of the timbre, used as the cache key.
+    :param func: ``np.sin`` or ``np.cos``.
+    :param harmonics: The amplitude weights of the harmonics, starting with the fundamental.
+    :param freq: The frequency that will be played from the table, in Hz.
+
+    :returns: A numpy array of length *kWavetableSize + 1*. The last sample repeats the first,
+        so that interpolation never needs to wrap around.
+    """
+    num = max(1, min(len(harmonics), int((Audio.sample_rate / 2) // freq)))
+    key = (timbre, num)
+    table = g_wavetables.get(key)
+    if table is None:
+        phase = np.arange(kWavetableSize + 1) * (2.0 * np.pi / kWavetableSize)
+        table = np.zeros(kWavetableSize + 1)
+        for (h, w) in enumerate(harmonics[:num]):
+            if w != 0:
+                table += w * func(phase * (h+1))
+        g_wavetables[key] = table
+    return table
+
 class NoteGenerator(object):
     """
     Generates repeating waveforms to create constant tones/notes.
     """
 
-    def __init__(self, pitch, gain, timbre="sine"):
+    def __init__(self, pitch, gain, timbre="sine", wavetable=False):
         """
         :param pitch: The MIDI pitch of the note to be generated.
         :param gain: The gain/volume of the note.
@@ -35,6 +66,8 @@ class NoteGenerator(object):
             and allows the production of different timbres, or sound qualities.
             Can be set to one of the following: ``sine``, ``square``, ``sawtooth``, or ``triangle``.
             Defaults to ``sine``.
+        :param wavetable: If True, renders by looking up a precomputed single-cycle table instead
+            of evaluating every harmonic, so the cost does not depend on the timbre.
         """
 
         super(NoteGenerator, self).__init__()
@@ -54,6 +87,12 @@ class NoteGenerator(object):
         self.func = harmonics[timbre][0]
         self.harmonics = harmonics[timbre][1]
 
+        self.table = None
+        if wavetable:
+            self.table = get_wavetable(timbre, self.func, self.harmonics, self.freq)
+            self.phase = 0.0  # in cycles, [0, 1)
+            self.phase_inc = self.freq / Audio.sample_rate
+
     def note_off(self):
         """
         Halts tone generation.
@@ -74,14 +113,17 @@ class NoteGenerator(object):
             if :meth:`note_off` has been called.
         """
 
-        # create time series from frame range
-        time = np.arange(self.frame, self.frame + num_frames) / Audio.sample_rate
+        if self.table is not None:
+            output = self.gain * self._read_wavetable(num_frames)
+        else:
+            # create time series from frame range
+            time = np.arange(self.frame, self.frame + num_frames) / Audio.sample_rate
 
-        # frequency
-        omega = (2.0 * np.pi) * self.freq
+            # frequency
+            omega = (2.0 * np.pi) * self.freq
 
-        # final output, gain
-        output = self.gain * self._make_waveform(omega * time)
+            # final output, gain
+            output = self.gain * self._make_waveform(omega * time)
 
         # advance frame counter
         self.frame += num_frames
@@ -107,6 +149,16 @@ class NoteGenerator(object):
 
         return signal
 
+    # phase-accumulated table lookup, with linear interpolation between table samples
+    def _read_wavetable(self, num_frames):
+        pos = (self.phase + np.arange(num_frames) * self.phase_inc) % 1.0 * kWavetableSize
+        idx = pos.astype(int)
+        frac = pos - idx
+        signal = self.table[idx] * (1.0 - frac) + self.table[idx + 1] * frac
+
+        self.phase = (self.phase + num_frames * self.phase_inc) % 1.0
+        return signal
+
 
 class Envelope(object):
     """
@@ -152,7 +204,8 @@ class Envelope(object):
         :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
 
         :returns: A tuple ``(output, continue_flag)``. The output is the result of combining
-            the envelope and the waveform from the generator specified on initialization.
+            the envelope and the waveform from the generator specified on initialization,
+            or ``None`` if the generator was silent.
             The continue_flag is ``False`` if the envelope has ended, and ``True`` otherwise.
         """
 
@@ -161,19 +214,25 @@ class Envelope(object):
 
         # set up correct frame ranges:
         end_frame = self.frame + num_frames
+
+        # silent input stays silent. Just advance the envelope
+        if data is None:
+            if end_frame > self.attack_frames + self.decay_frames:
+                continue_flag = False
+            self.frame = end_frame
+            return None, continue_flag
+
         frames = np.arange(self.frame, end_frame)
+        env = np.empty(num_frames)
 
         # boundary is the transition location between attack and decay functions
         boundary = int(np.clip(self.attack_frames - self.frame, 0, num_frames))
 
         # attack part:
-        env1 = (frames[:boundary] / self.attack_frames) ** (1.0/self.n1)
+        env[:boundary] = (frames[:boundary] / self.attack_frames) ** (1.0/self.n1)
 
         # decay part:
-        env2 = 1.0 - ((frames[boundary:] - self.attack_frames) / self.decay_frames) ** (1.0/self.n2)
-
-        # combine:
-        env = np.append(env1, env2)
+        env[boundary:] = 1.0 - ((frames[boundary:] - self.attack_frames) / self.decay_frames) ** (1.0/self.n2)
 
         # deal with end of envelope:
         # clamp curve to 0, so we don't get any negative values and don't continue
@@ -184,13 +243,155 @@ class Envelope(object):
         # advance frame counter
         self.frame = end_frame
 
-        # make envelope work for stereo if needed
-        if num_channels == 2:
-            stereo = np.empty(num_frames * 2)
-            stereo[0::2] = env
-            stereo[1::2] = env
-            env = stereo
-
-        output = env * data
+        # apply the same envelope to every channel of each frame
+        output = (np.reshape(data, (num_frames, num_channels)) * env[:, np.newaxis]).reshape(-1)
         return output, continue_flag
 
+
+
+class VoicePool(object):
+    """
+    A polyphonic generator of short tones (eg, sound effects) with a fixed number of voices.
+    All voices are rendered together: their oscillator and ADSR envelope state is kept in one
+    2D numpy array, so each buffer costs about the same no matter how many voices are sounding.
+    When all voices are busy, :meth:`note_on` steals the oldest one.
+    """
+
+    # rows of self.state, one column per voice
+    kPhase, kPhaseInc, kGain, kTime, kOffTime, kTable, kStartOrder = range(7)
+
+    def __init__(self, num_voices = 16, timbre = "sine", attack_time = 0.01, decay_time = 0.1,
+                 sustain_level = 0.7, release_time = 0.2):
+        """
+        :param num_voices: The maximum number of tones that can sound at once.
+        :param timbre: One of ``sine``, ``square``, ``sawtooth``, or ``triangle``, as in :class:`NoteGenerator`.
+        :param attack_time: Time to rise from 0 to full level, in seconds.
+        :param decay_time: Time to fall from full level to *sustain_level*, in seconds.
+        :param sustain_level: The level held until the note is released, between 0 and 1.
+        :param release_time: Time to fall from the current level to 0 after release, in seconds.
+        """
+        super(VoicePool, self).__init__()
+
+        self.num_voices = num_voices
+        self.timbre = timbre
+        timbres = NoteGenerator(69, 0, timbre)
+        self.func, self.harmonics = timbres.func, timbres.harmonics
+
+        # envelope parameters, converted from seconds to frames
+        self.attack_frames = max(1, round(attack_time * Audio.sample_rate))
+        self.decay_frames = max(1, round(decay_time * Audio.sample_rate))
+        self.sustain_level = sustain_level
+        self.release_frames = max(1, round(release_time * Audio.sample_rate))
+
+        self.state = np.zeros((7, num_voices))
+        self.active = np.zeros(num_voices, dtype=bool)
+        self.next_order = 0
+
+        # band-limited wavetables in use, stacked so voices can index them all at once
+        self.table_keys = []
+        self.tables = np.zeros((0, kWavetableSize + 1))
+
+    def note_on(self, pitch, gain, duration = None):
+        """
+        Starts a tone.
+
+        :param pitch: The MIDI pitch of the tone.
+        :param gain: The gain/volume of the tone.
+        :param duration: If given, the tone is released automatically after this many seconds.
+
+        :returns: The voice index playing the tone, to pass to :meth:`note_off`.
+        """
+        free = np.flatnonzero(~self.active)
+        if len(free):
+            voice = free[0]
+        else:
+            voice = int(np.argmin(self.state[self.kStartOrder]))
+
+        freq = midi_to_frequency(pitch)
+        s = self.state
+        s[self.kPhase, voice] = 0.0
+        s[self.kPhaseInc, voice] = freq / Audio.sample_rate
+        s[self.kGain, voice] = gain
+        s[self.kTime, voice] = 0
+        s[self.kOffTime, voice] = np.inf if duration is None else round(duration * Audio.sample_rate)
+        s[self.kTable, voice] = self._table_index(freq)
+        s[self.kStartOrder, voice] = self.next_order
+        self.next_order += 1
+        self.active[voice] = True
+        return voice
+
+    def note_off(self, voice):
+        """
+        Releases a tone started by :meth:`note_on`.
+
+        :param voice: The voice index returned by :meth:`note_on`.
+        """
+        if self.active[voice]:
+            s = self.state
+            s[self.kOffTime, voice] = min(s[self.kOffTime, voice], s[self.kTime, voice])
+
+    def get_num_active(self):
+        """
+        :returns: The number of voices currently sounding.
+        """
+        return int(np.count_nonzero(self.active))
+
+    def generate(self, num_frames, num_channels):
+        """
+        Renders all active voices.
+
+        :param num_frames: An integer number of frames to generate.
+        :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
+
+        :returns: A tuple ``(output, True)``. The output is a numpy array of size
+            num_frames * num_channels, or ``None`` if no voice is sounding.
+        """
+        voices = np.flatnonzero(self.active)
+        if len(voices) == 0:
+            return (None, True)
+
+        s = self.state[:, voices]
+        steps = np.arange(num_frames)
+
+        # oscillators: (voices, frames) phase-accumulated wavetable lookup
+        pos = (s[self.kPhase, :, None] + steps * s[self.kPhaseInc, :, None]) % 1.0 * kWavetableSize
+        idx = pos.astype(int)
+        frac = pos - idx
+        rows = s[self.kTable].astype(int)[:, None]
+        wave = self.tables[rows, idx] * (1.0 - frac) + self.tables[rows, idx + 1] * frac
+
+        # envelopes, as a function of frames since note on (t) and since release (t_off)
+        t = s[self.kTime, :, None] + steps
+        t_off = s[self.kOffTime, :, None]
+        env = self._held_level(t)
+        # level reached at release time (notes not released yet get a finite stand-in; it's unused)
+        release_level = self._held_level(np.minimum(t_off, t[:, :1] + num_frames))
+        released = np.clip(1.0 - (t - t_off) / self.release_frames, 0.0, 1.0) * release_level
+        env = np.where(t >= t_off, released, env)
+
+        mono = (wave * env * s[self.kGain, :, None]).sum(axis=0)
+
+        # advance voices, and free the ones whose release has finished
+        self.state[self.kPhase, voices] = (s[self.kPhase] + num_frames * s[self.kPhaseInc]) % 1.0
+        self.state[self.kTime, voices] += num_frames
+        done = self.state[self.kTime, voices] >= s[self.kOffTime] + self.release_frames
+        self.active[voices[done]] = False
+
+        output = np.empty((num_frames, num_channels))
+        output[:] = mono[:, np.newaxis]
+        return (output.reshape(-1), True)
+
+    # attack / decay / sustain level at frame t (array) of a held note
+    def _held_level(self, t):
+        attack = t / self.attack_frames
+        decay = 1.0 - (1.0 - self.sustain_level) * np.clip((t - self.attack_frames) / self.decay_frames, 0.0, 1.0)
+        return np.minimum(attack, decay)
+
+    def _table_index(self, freq):
+        table = get_wavetable(self.timbre, self.func, self.harmonics, freq)
+        for i, t in enumerate(self.table_keys):
+            if t is table:
+                return i
+        self.table_keys.append(table)
+        self.tables = np.vstack((self.tables, table))
+        return len(self.table_keys) - 1
@@ -0,0 +1,297 @@
+#####################################################################
+#
+# This software is to be used for MIT's class Interactive Music Systems only.
+# Since this file may contain answers to homework problems, you MAY NOT release it publicly.
+#
+#####################################################################
+
+import hashlib
+import os
+import struct
+
+from .cache import get_cache_dir
+
+FluidR3_GM_URL = 'https://github.com/urish/cinto/raw/master/media/FluidR3%20GM.sf2'
+
+# (struct format, record size) of each sub-chunk found in the pdta LIST
+kPdtaFormats = {
+    'phdr': ('<20sHHHIII', 38),
+    'pbag': ('<HH', 4),
+    'pmod': ('<HHhHH', 10),
+    'pgen': ('<HH', 4),
+    'inst': ('<20sH', 22),
+    'ibag': ('<HH', 4),
+    'imod': ('<HHhHH', 10),
+    'igen': ('<HH', 4),
+    'shdr': ('<20sIIIIIBbHH', 46),
+}
+kPdtaOrder = ('phdr', 'pbag', 'pmod', 'pgen', 'inst', 'ibag', 'imod', 'igen', 'shdr')
+
+# generator operators that reference other records
+kGenInstrument = 41
+kGenSampleID = 53
+
+# every sample must be followed by at least 46 zero-valued data points
+kSamplePadding = 46
+
+
+def get_cached_fluidbank():
+    """
+    Finds the locally cached FluidR3_GM.sf2 file, downloading it first if necessary.
+
+    :returns: The path to the cached file.
+    """
+    filename = 'FluidR3_GM.sf2'
+    cachedir = get_cache_dir()
+    filepath = os.path.join(cachedir, filename)
+
+    # file does not exist, so get a copy
+    if not os.path.exists(filepath):
+        from urllib.request import urlretrieve
+        if not os.path.exists(cachedir):
+            os.makedirs(cachedir)
+
+        tmp_filename = 'FluidR3_GM.sf2.tmp'
+        tmp_filepath = os.path.join(cachedir, tmp_filename)
+
+        def progress(num_blocks, block_size, total_size):
+            pct = int(100 * num_blocks * block_size / total_size)
+            txt = f'Downloading {filename}: {pct}%'
+            print(txt, end='\r', flush=True)
+
+        # download to a temporary file, then rename it
+        # this means that if the user stops the download, the file won't be left in a corrupted state
+        urlretrieve(url=FluidR3_GM_URL, filename=tmp_filepath, reporthook=progress)
+        os.rename(tmp_filepath, filepath)
+        print('Done')
+
+    return filepath
+
+
+def get_subset_path(presets, src_path = None):
+    """
+    Finds where the trimmed copy of a SoundFont containing only `presets` lives in the cache.
+    The file name is keyed by the set of presets and by the source file, so editing or replacing
+    the source bank produces a different name.
+
+    :param presets: An iterable of ``(bank, preset)`` tuples.
+    :param src_path: The full SoundFont. If ``None``, uses the cached FluidR3_GM.sf2.
+
+    :returns: The path of the derived file. The file itself may not exist yet.
+    """
+    if src_path is None:
+        src_path = os.path.join(get_cache_dir(), 'FluidR3_GM.sf2')
+
+    st = os.stat(src_path) if os.path.exists(src_path) else None
+    key = ';'.join('%d.%d' % p for p in sorted(set(presets)))
+    src_key = '%s:%d:%d' % (os.path.basename(src_path), st.st_size, st.st_mtime) if st else src_path
+    digest = hashlib.sha1((src_key + '|' + key).encode()).hexdigest()[:16]
+
+    base = os.path.splitext(os.path.basename(src_path))[0]
+    return os.path.join(get_cache_dir(), 'subsets', '%s-%s.sf2' % (base, digest))
+
+
+def find_subset(presets, src_path = None):
+    """
+    :returns: The path to a previously built trimmed SoundFont containing `presets`, or ``None``
+        if it has not been built.
+    """
+    path = get_subset_path(presets, src_path)
+    return path if os.path.exists(path) else None
+
+
+def build_subset(presets, src_path = None):
+    """
+    Builds (if needed) the trimmed SoundFont containing `presets` in the cache.
+
+    :param presets: An iterable of ``(bank, preset)`` tuples.
+    :param src_path: The full SoundFont. If ``None``, uses (and downloads if needed) FluidR3_GM.sf2.
+
+    :returns: The path of the derived file.
+    """
+    if src_path is None:
+        src_path = get_cached_fluidbank()
+
+    path = get_subset_path(presets, src_path)
+    if not os.path.exists(path):
+        subset_soundfont(src_path, path, presets)
+    return path
+
+
+def subset_soundfont(src_path, dst_path, presets):
+    """
+    Writes a new SoundFont holding only the requested presets along with the instruments and
+    samples they reference. Presets that are not found in the source are ignored.
+
+    :param src_path: Path to the source .sf2 file.
+    :param dst_path: Path of the .sf2 file to write.
+    :param presets: An iterable of ``(bank, preset)`` tuples to keep.
+
+    :returns: The number of presets written.
+    """
+    with open(src_path, 'rb') as f:
+        data = f.read()
+
+    info, smpl, sm24, pdta = _read_sfbk(data)
+    wanted = set(presets)
+
+    # --- presets ---
+    phdr = pdta['phdr']
+    keep_presets = [i for i in range(len(phdr) - 1) if (phdr[i][2], phdr[i][1]) in wanted]
+
+    pbag, pmod, pgen = [], [], []
+    inst_refs = {}
+    new_phdr = []
+    for i in keep_presets:
+        name, preset, bank, bag_ndx, lib, genre, morph = phdr[i]
+        new_phdr.append((name, preset, bank, len(pbag), lib, genre, morph))
+        _copy_zones(pdta['pbag'], pdta['pmod'], pdta['pgen'], bag_ndx, phdr[i + 1][3],
+                    pbag, pmod, pgen, kGenInstrument, inst_refs)
+
+    # --- instruments ---
+    inst = pdta['inst']
+    ibag, imod, igen = [], [], []
+    sample_refs = {}
+    new_inst = []
+    for old_idx in sorted(inst_refs, key=inst_refs.get):
+        name, bag_ndx = inst[old_idx]
+        new_inst.append((name, len(ibag)))
+        _copy_zones(pdta['ibag'], pdta['imod'], pdta['igen'], bag_ndx, inst[old_idx + 1][1],
+                    ibag, imod, igen, kGenSampleID, sample_refs)
+
+    _remap_refs(pgen, kGenInstrument, inst_refs)
+
+    # --- samples (including the other half of stereo pairs) ---
+    shdr = pdta['shdr']
+    pending = list(sample_refs)
+    while pending:
+        sample = shdr[pending.pop()]
+        link, sample_type = sample[8], sample[9]
+        if sample_type & 0x0e and link < len(shdr) - 1 and link not in sample_refs:
+            sample_refs[link] = len(sample_refs)
+            pending.append(link)
+
+    new_smpl = bytearray()
+    new_sm24 = bytearray()
+    new_shdr = []
+    for old_idx in sorted(sample_refs, key=sample_refs.get):
+        name, start, end, loop_start, loop_end, sr, key, corr, link, stype = shdr[old_idx]
+        offset = len(new_smpl) // 2
+        new_smpl += smpl[start * 2 : end * 2] + bytes(kSamplePadding * 2)
+        if sm24 is not None:
+            new_sm24 += sm24[start : end] + bytes(kSamplePadding)
+        delta = offset - start
+        new_link = sample_refs.get(link, 0)
+        new_shdr.append((name, start + delta, end + delta, loop_start + delta, loop_end + delta,
+                         sr, key, corr, new_link, stype))
+
+    _remap_refs(igen, kGenSampleID, sample_refs)
+
+    # --- terminal records ---
+    new_phdr.append((b'EOP', 0, 0, len(pbag), 0, 0, 0))
+    pbag.append((len(pgen), len(pmod)))
+    pmod.append((0, 0, 0, 0, 0))
+    pgen.append((0, 0))
+    new_inst.append((b'EOI', len(ibag)))
+    ibag.append((len(igen), len(imod)))
+    imod.append((0, 0, 0, 0, 0))
+    igen.append((0, 0))
+    new_shdr.append((b'EOS', 0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+    records = {
+        'phdr': new_phdr, 'pbag': pbag, 'pmod': pmod, 'pgen': pgen,
+        'inst': new_inst, 'ibag': ibag, 'imod': imod, 'igen': igen, 'shdr': new_shdr,
+    }
+    sdta_chunks = [('smpl', bytes(new_smpl))]
+    if sm24 is not None:
+        if len(new_sm24) % 2:
+            new_sm24 += b'\0'
+        sdta_chunks.append(('sm24', bytes(new_sm24)))
+
+    body = b'sfbk'
+    body += _chunk('LIST', info)
+    body += _chunk('LIST', b'sdta' + b''.join(_chunk(cid, d) for cid, d in sdta_chunks))
+    body += _chunk('LIST', b'pdta' + b''.join(_pack_records(cid, records[cid]) for cid in kPdtaOrder))
+
+    # write to a temporary file, then rename it so an interrupted build never leaves a corrupt file
+    dst_dir = os.path.dirname(dst_path)
+    if dst_dir and not os.path.exists(dst_dir):
+        os.makedirs(dst_dir)
+    tmp_path = dst_path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(_chunk('RIFF', body))
+    os.replace(tmp_path, dst_path)
+
+    return len(keep_presets)
+
+
+# copy the zones (bags) in [bag_start, bag_end) along with their modulators and generators. Any
+# generator of type ref_oper is recorded in refs (old index -> new index), to be remapped later.
+def _copy_zones(bags, mods, gens, bag_start, bag_end, out_bags, out_mods, out_gens, ref_oper, refs):
+    for b in range(bag_start, bag_end):
+        gen_ndx, mod_ndx = bags[b]
+        next_gen, next_mod = bags[b + 1]
+        out_bags.append((len(out_gens), len(out_mods)))
+        out_mods.extend(mods[mod_ndx:next_mod])
+        for oper, amount in gens[gen_ndx:next_gen]:
+            if oper == ref_oper and amount not in refs:
+                refs[amount] = len(refs)
+            out_gens.append((oper, amount))
+
+
+def _remap_refs(gens, ref_oper, refs):
+    for i, (oper, amount) in enumerate(gens):
+        if oper == ref_oper:
+            gens[i] = (oper, refs[amount])
+
+
+def _read_sfbk(data):
+    riff_id, size, form = struct.unpack_from('<4sI4s', data, 0)
+    if riff_id != b'RIFF' or form != b'sfbk':
+        raise ValueError('not a SoundFont 2 file')
+
+    info = smpl = sm24 = None
+    pdta = {}
+    for cid, start, end in _iter_chunks(data, 12, 8 + size):
+        if cid != 'LIST':
+            continue
+        list_type = data[start:start + 4]
+        if list_type == b'INFO':
+            info = data[start:end]
+        elif list_type == b'sdta':
+            for sub, s, e in _iter_chunks(data, start + 4, end):
+                if sub == 'smpl':
+                    smpl = data[s:e]
+                elif sub == 'sm24':
+                    sm24 = data[s:e]
+        elif list_type == b'pdta':
+            for sub, s, e in _iter_chunks(data, start + 4, end):
+                if sub in kPdtaFormats:
+                    fmt, rec_size = kPdtaFormats[sub]
+                    pdta[sub] = [struct.unpack_from(fmt, data, o) for o in range(s, e - rec_size + 1, rec_size)]
+
+    missing = [cid for cid in kPdtaOrder if cid not in pdta]
+    if info is None or smpl is None or missing:
+        raise ValueError('malformed SoundFont: missing ' + ', '.join(missing or ['INFO/sdta']))
+    return info, smpl, sm24, pdta
+
+
+# yields (chunk_id, data_start, data_end) for consecutive RIFF chunks in data[start:end]
+def _iter_chunks(data, start, end):
+    pos = start
+    while pos + 8 <= end:
+        cid, size = struct.unpack_from('<4sI', data, pos)
+        yield cid.decode('latin-1'), pos + 8, pos + 8 + size
+        pos += 8 + size + (size & 1)
+
+
+def _chunk(cid, payload):
+    out = struct.pack('<4sI', cid.encode('latin-1'), len(payload)) + payload
+    if len(payload) & 1:
+        out += b'\0'
+    return out
+
+
+def _pack_records(cid, records):
+    fmt = kPdtaFormats[cid][0]
+    return _chunk(cid, b''.join(struct.pack(fmt, *r) for r in records))
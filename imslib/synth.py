@@ -8,10 +8,7 @@
 import numpy as np
 import fluidsynth
 from .audio import Audio
-import pathlib
-import os
-
-FluidR3_GM_URL = 'https://github.com/urish/cinto/raw/master/media/FluidR3%20GM.sf2'
+from .sf2 import get_cached_fluidbank
 
 # create another kind of generator that generates audio based on the fluid
 # synth synthesizer
@@ -136,28 +133,4 @@ class Synth(fluidsynth.Synth, object):
 
     def _get_cached_fluidbank(self):
         """find cached file, or download first if necessary"""
-        filename = 'FluidR3_GM.sf2'
-        cachedir = os.path.join(str(pathlib.Path.home()), '.ims')
-        filepath = os.path.join(cachedir, filename)
-
-        # file does not exist, so get a copy
-        if not os.path.exists(filepath):
-            from urllib.request import urlretrieve
-            if not os.path.exists(cachedir):
-                os.makedirs(cachedir)
-
-            tmp_filename = 'FluidR3_GM.sf2.tmp'
-            tmp_filepath = os.path.join(cachedir, tmp_filename)
-
-            def progress(num_blocks, block_size, total_size):
-                pct = int(100 * num_blocks * block_size / total_size)
-                txt = f'Downloading {filename}: {pct}%'
-                print(txt, end='\r', flush=True)
-
-            # download to a temporary file, then rename it
-            # this means that if the user stops the download, the file won't be left in a corrupted state
-            urlretrieve(url=FluidR3_GM_URL, filename=tmp_filepath, reporthook=progress)
-            os.rename(tmp_filepath, filepath)
-            print('Done')
-
-        return filepath
+        return get_cached_fluidbank()
@@ -75,19 +75,18 @@ class WaveGenerator(object):
 
     def generate(self, num_frames, num_channels):
         """
-        Generates output from the wave source. When paused, only zeros are
-        generated. When looping, if the end of the buffer is reached, more
-        data will be read from the beginning.
+        Generates output from the wave source. When paused, no audio is
+        generated and the output is ``None`` (silence). When looping, if the end
+        of the buffer is reached, more data will be read from the beginning.
 
         :param num_frames: An integer number of frames to generate.
         :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
 
         :returns: A tuple ``(output, True)``. The output is the audio data from
-            wave source, a numpy array of size num_frames * num_channels.
+            wave source, a numpy array of size num_frames * num_channels, or ``None`` when paused.
         """
         if self.paused:
-            output = np.zeros(num_frames * num_channels)
-            return (output, True)
+            return (None, True)
 
         else:
             # get data based on our position and requested # of frames
@@ -153,7 +152,9 @@ def convert_channels(data, in_channels, out_channels):
 
 class SpeedModulator(object):
     """
-    Modulates the speed of generated data from a source.
+    Modulates the speed of generated data from a source. Resampling uses linear interpolation
+    over all channels at once, and the fractional read position carries over from one buffer
+    to the next, so slow or non-integer speeds play back smoothly.
     """
     def __init__(self, generator, speed = 1.0):
         """
@@ -165,6 +166,11 @@ class SpeedModulator(object):
         self.generator = generator
         self.speed = speed
 
+        # the last two source frames consumed, and the read position of the next output
+        # frame relative to the newer of them. 1.0 means "the next source frame".
+        self.history = None
+        self.phase = 1.0
+
     def set_speed(self, speed):
         """
         Sets the factor by which the speed should be modulated. For example, a speed
@@ -183,30 +189,52 @@ class SpeedModulator(object):
         :param num_channels: Number of channels. Can be 1 (mono) or 2 (stereo)
 
         :returns: A tuple ``(output, True)``. The output is the audio data from
-            wave source, a numpy array of size num_frames * num_channels.
+            wave source, a numpy array of size num_frames * num_channels, or ``None``
+            if the source generator was silent.
         """
-        # optimization if speed is 1.0
-        if self.speed == 1.0:
-            return self.generator.generate(num_frames, num_channels)
-
-        # otherwise, we need to ask self.generator for a number of frames that is
-        # larger or smaller than num_frames, depending on self.speed
-        adj_frames = int(round(num_frames * self.speed))
-
-        # get data from generator
-        data, continue_flag = self.generator.generate(adj_frames, num_channels)
+        if self.history is None or self.history.shape[1] != num_channels:
+            self.history = np.zeros((2, num_channels))
 
-        # split into multi-channels:
-        data_chans = [ data[n::num_channels] for n in range(num_channels) ]
+        # optimization if speed is 1.0 and we are aligned to source frames
+        if self.speed == 1.0 and self.phase == 1.0:
+            data, continue_flag = self.generator.generate(num_frames, num_channels)
+            self._set_history(data, num_channels)
+            return (data, continue_flag)
 
-        # stretch or squash data to fit exactly into num_frames
-        from_range = np.arange(adj_frames)
-        to_range = np.arange(num_frames) * (float(adj_frames) / num_frames)
-        resampled = [ np.interp(to_range, from_range, data_chans[n]) for n in range(num_channels) ]
+        # read positions of this buffer's output frames, relative to the newest history frame.
+        # ask self.generator for just enough frames to interpolate the last one.
+        positions = self.phase + np.arange(num_frames) * self.speed
+        adj_frames = int(positions[-1]) + 1
 
-        # convert back by interleaving into a single buffer
-        output = np.empty(num_channels * num_frames, dtype=float)
-        for n in range(num_channels):
-            output[n::num_channels] = resampled[n]
-
-        return (output, continue_flag)
+        # get data from generator
+        if adj_frames > 0:
+            data, continue_flag = self.generator.generate(adj_frames, num_channels)
+        else:
+            data, continue_flag = np.empty(0), True
+
+        # next buffer continues where this one left off, relative to the new newest frame
+        self.phase = self.phase + num_frames * self.speed - adj_frames
+
+        # silence stays silent, so skip resampling
+        if data is None:
+            self.history[:] = 0
+            return (None, continue_flag)
+
+        # stack history and new data as (frames, channels), then interpolate all channels at once
+        frames = np.concatenate((self.history, np.reshape(data, (-1, num_channels))))
+        positions += 1  # history[1] is at index 1 of frames
+        idx = positions.astype(int)
+        frac = (positions - idx)[:, np.newaxis]
+        output = frames[idx] * (1.0 - frac) + frames[idx + 1] * frac
+
+        self.history[:] = frames[-2:]
+        return (output.reshape(-1), continue_flag)
+
+    def _set_history(self, data, num_channels):
+        if data is None:
+            self.history[:] = 0
+        elif len(data) >= 2 * num_channels:
+            self.history[:] = np.reshape(data[-2 * num_channels:], (2, num_channels))
+        elif len(data):
+            self.history[0] = self.history[1]
+            self.history[1] = data[-num_channels:]
@@ -6,56 +6,91 @@
 #####################################################################
 
 import numpy as np
-import wave
+import hashlib
+import math
+import os
+import struct
+import threading
+import weakref
+from collections import OrderedDict
 from .audio import Audio
+from .cache import get_cache_dir
 
 class WaveFile(object):
     """
 
-    Interface for reading data from a wave file. Does not store this data locally.
-    Simply call `get_frames()` to get data in a format we like *(numpy array, floats)*.
+    Interface for reading data from a wave file. Does not store this data locally: the
+    file's sample data is memory-mapped once, and shared by all WaveFiles opened on the same file.
+    Simply call `get_frames()` to get data in a format we like *(numpy array, floats)*, or
+    `get_raw_frames()` for a zero-copy view of the samples.
+
+    Files that are not 16 bit at Audio.sample_rate are decoded and resampled the first time
+    they are loaded. The converted float32 data is cached on disk (see :func:`load_converted`),
+    so later loads map it just like a native file.
 
     """
 
     def __init__(self, filepath):
         """
-        :param filepath: The path to the wave file. Should be a 16 bit file with a sample rate of 44100Hz.
+        :param filepath: The path to the wave file (or a binary file-like object).
+            May be 8, 16, 24 or 32 bit integer PCM or 32/64 bit float, at any sample rate.
         """
         super(WaveFile, self).__init__()
 
-        self.wave = wave.open(filepath)
-        self.num_channels, self.sampwidth, self.sr, self.end, \
-           comptype, compname = self.wave.getparams()
+        self.wave = open_wave_map(filepath)
+        self.num_channels = self.wave.num_channels
+        self.sampwidth = self.wave.sampwidth
+        self.sr = self.wave.sr
+
+        if self.wave.is_native():
+            self.samples = self.wave.samples
+            self.scale = 1 / 32768.0
+        else:
+            self.samples = load_converted(self.wave)
+            self.scale = 1.0
 
-        # for now, we will only accept 16 bit files and the sample rate must match
-        assert(self.sampwidth == 2)
-        assert(self.sr == Audio.sample_rate)
+        # in frames at Audio.sample_rate, which may differ from the file's own length
+        self.end = len(self.samples) // self.num_channels
+
+    def get_raw_frames(self, start_frame, num_frames):
+        """
+        Gets a range of frames of audio data without copying or converting it.
+
+        :param start_frame: The frame of the wave file to start on.
+        :param num_frames: The number of frames of the wave file to read.
+
+        :returns: A read-only numpy view into the wave file's interleaved samples: int16 for native
+            files, or float32 in [-1, 1] for converted ones.
+            Array length is *num_frames * num_channels*, but could be smaller if more frames are asked for than are available.
+        """
+        start_frame = min(max(start_frame, 0), self.end)
+        end_frame = min(start_frame + num_frames, self.end)
+        return self.samples[start_frame * self.num_channels : end_frame * self.num_channels]
 
     # read an arbitrary chunk of data from the file
-    def get_frames(self, start_frame, num_frames):
+    def get_frames(self, start_frame, num_frames, out = None):
         """
         Gets a range of frames of audio data from the provided wavefile.
 
         :param start_frame: The frame of the wave file to start on.
         :param num_frames: The number of frames of the wave file to read.
+        :param out: Optional float array to convert the samples into, of length at least
+            *num_frames * num_channels*. Avoids allocating a new array on every call.
 
         :returns: A numpy array of audio data, starting from *start_frame* in the wave file.
             Array length is *num_frames*, but could be smaller if more frames are asked for than are available.
+            If `out` is given, the returned array is a view of it.
         """
 
-        # get the raw data from wave file as a byte string. If asking for more than is available, it just
-        # returns what it can
-        self.wave.setpos(start_frame)
-        raw_bytes = self.wave.readframes(num_frames)
-
-        # convert raw data to numpy array, assuming int16 arrangement
-        samples = np.fromstring(raw_bytes, dtype = np.int16)
+        raw = self.get_raw_frames(start_frame, num_frames)
+        if out is None:
+            out = np.empty(len(raw))
+        else:
+            out = out[:len(raw)]
 
         # convert from integer type to floating point, and scale to [-1, 1]
-        samples = samples.astype(float)
-        samples *= (1 / 32768.0)
-
-        return samples
+        np.multiply(raw, self.scale, out = out)
+        return out
 
     def get_num_channels(self):
         """
@@ -64,25 +99,268 @@ class WaveFile(object):
 
         return self.num_channels
 
+class WaveMap(object):
+    """
+    The parsed header and memory-mapped sample data of one wave file. Use :func:`open_wave_map`
+    so that all users of a file share one mapping. `samples` holds int16 values for 16 bit PCM
+    files, and the raw bytes of the data chunk for any other format.
+    """
+    def __init__(self, fmt, samples):
+        super(WaveMap, self).__init__()
+        self.format_tag = fmt['format_tag']
+        self.num_channels = fmt['num_channels']
+        self.sampwidth = fmt['sampwidth']
+        self.bits = fmt['bits']
+        self.sr = fmt['sr']
+        self.samples = samples
+        frame_bytes = self.num_channels * self.sampwidth
+        self.num_frames = samples.nbytes // frame_bytes if frame_bytes else 0
+
+    def is_native(self):
+        """
+        :returns: True if the samples can be played as they are: 16 bit PCM at Audio.sample_rate.
+        """
+        return self.format_tag == kWaveFormatPCM and self.sampwidth == 2 and self.sr == Audio.sample_rate
+
+kWaveFormatPCM = 1
+kWaveFormatFloat = 3
+
+# live mappings, keyed by (path, mtime, size). Entries vanish once no WaveFile uses them.
+g_wave_maps = weakref.WeakValueDictionary()
+
+def open_wave_map(filepath):
+    """
+    Parses a wave file's RIFF header once and maps its data chunk into memory.
+
+    :param filepath: The path to the wave file, or a binary file-like object
+        (which is read into memory instead of mapped).
+
+    :returns: A :class:`WaveMap`. Opening the same unchanged path again returns the same object.
+    """
+    if not isinstance(filepath, (str, bytes, os.PathLike)):
+        fmt, data_offset, data_size = read_wave_header(filepath)
+        filepath.seek(data_offset)
+        raw = filepath.read(data_size)
+        dtype = _map_dtype(fmt)
+        return WaveMap(fmt, np.frombuffer(raw, dtype = dtype, count = _map_count(fmt, len(raw))))
+
+    path = os.path.abspath(filepath)
+    st = os.stat(path)
+    key = (path, st.st_mtime_ns, st.st_size)
+    wave_map = g_wave_maps.get(key)
+    if wave_map is None:
+        with open(path, 'rb') as f:
+            fmt, data_offset, data_size = read_wave_header(f)
+
+        # the data chunk may claim more than the file actually holds
+        dtype = _map_dtype(fmt)
+        count = _map_count(fmt, min(data_size, st.st_size - data_offset))
+        if count > 0:
+            samples = np.memmap(path, dtype = dtype, mode = 'r', offset = data_offset, shape = (count,))
+        else:
+            samples = np.zeros(0, dtype = dtype)
+        wave_map = WaveMap(fmt, samples)
+        g_wave_maps[key] = wave_map
+    return wave_map
+
+def _map_dtype(fmt):
+    if fmt['format_tag'] == kWaveFormatPCM and fmt['sampwidth'] == 2:
+        return np.dtype('<i2')
+    return np.dtype('u1')
+
+# number of items of _map_dtype(fmt) that make up the whole frames in num_bytes
+def _map_count(fmt, num_bytes):
+    frame_bytes = fmt['num_channels'] * fmt['sampwidth']
+    if frame_bytes == 0:
+        return 0
+    return (num_bytes - num_bytes % frame_bytes) // _map_dtype(fmt).itemsize
+
+
+# bump when decoding or resampling changes, so old cache entries are not used
+kConvertVersion = 1
+
+# converted arrays currently in use, keyed by cache file name
+g_converted = weakref.WeakValueDictionary()
+
+def load_converted(wave_map):
+    """
+    Gets the samples of a non-native wave file, decoded to float32 and resampled to Audio.sample_rate.
+    The result is stored in ``~/.ims/wavecache``, keyed by a hash of the file's format and
+    sample data, so the conversion runs once per file. Cached results are memory-mapped.
+
+    :param wave_map: A :class:`WaveMap` from :func:`open_wave_map`.
+
+    :returns: A read-only interleaved float32 array.
+    """
+    h = hashlib.sha1()
+    h.update(struct.pack('<HHHIII', wave_map.format_tag, wave_map.num_channels, wave_map.bits,
+                         wave_map.sr, Audio.sample_rate, kConvertVersion))
+    h.update(memoryview(np.ascontiguousarray(wave_map.samples)).cast('B'))
+    name = h.hexdigest() + '.npy'
+
+    data = g_converted.get(name)
+    if data is not None:
+        return data
+
+    cachedir = os.path.join(get_cache_dir(), 'wavecache')
+    path = os.path.join(cachedir, name)
+    if not os.path.exists(path):
+        data = decode_samples(wave_map)
+        data = resample(data.reshape(-1, wave_map.num_channels), wave_map.sr, Audio.sample_rate)
+        if not os.path.exists(cachedir):
+            os.makedirs(cachedir)
+        # write to a temporary file, then rename it, so an interrupted write can't leave a corrupt entry
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            np.save(f, data.reshape(-1))
+        os.replace(tmp_path, path)
+
+    data = np.load(path, mmap_mode = 'r')
+    g_converted[name] = data
+    return data
+
+def decode_samples(wave_map):
+    """
+    Decodes the data of a wave file to floating point.
+
+    :param wave_map: A :class:`WaveMap`.
+
+    :returns: An interleaved float32 array in the range [-1, 1].
+    """
+    raw = np.frombuffer(wave_map.samples, dtype = np.uint8) if wave_map.samples.dtype != np.uint8 else wave_map.samples
+    width = wave_map.sampwidth
+
+    if wave_map.format_tag == kWaveFormatFloat:
+        if width not in (4, 8):
+            raise ValueError('unsupported float sample width: %d' % width)
+        return raw.view('<f%d' % width).astype(np.float32)
+
+    if wave_map.format_tag != kWaveFormatPCM:
+        raise ValueError('unsupported wave format: %d' % wave_map.format_tag)
+
+    if width == 1:
+        # 8 bit samples are unsigned
+        return (raw.astype(np.float32) - 128) * (1 / 128.0)
+    if width == 2:
+        return raw.view('<i2') * np.float32(1 / 32768.0)
+    if width == 3:
+        b = raw.reshape(-1, 3).astype(np.int32)
+        ints = b[:, 0] | (b[:, 1] << 8) | (b[:, 2] << 16)
+        ints -= (ints & 0x800000) << 1  # sign-extend
+        return ints * np.float32(1 / 8388608.0)
+    if width == 4:
+        return raw.view('<i4') * np.float32(1 / 2147483648.0)
+    raise ValueError('unsupported PCM sample width: %d' % width)
+
+def resample(data, sr_in, sr_out, taps = 32, chunk_frames = 16384):
+    """
+    Changes the sample rate of audio with a polyphase windowed-sinc filter. All channels,
+    and a chunk of output frames at a time, are computed in one vectorized step.
+
+    :param data: A float array of shape *(num_frames, num_channels)*.
+    :param sr_in: The sample rate of `data`.
+    :param sr_out: The desired sample rate.
+    :param taps: Length of the filter per output sample. Longer is sharper and slower.
+    :param chunk_frames: Number of output frames computed at a time, to bound memory use.
+
+    :returns: A float32 array of shape *(num_out_frames, num_channels)*.
+    """
+    data = np.asarray(data, dtype = np.float32)
+    if sr_in == sr_out:
+        return data
+
+    # output frame n sits at input position n * down / up
+    g = math.gcd(int(sr_in), int(sr_out))
+    up, down = int(sr_out) // g, int(sr_in) // g
+    table = _polyphase_table(up, down, taps)
+
+    num_in, num_channels = data.shape
+    num_out = (num_in * up + down - 1) // down
+    half = taps // 2
+    padded = np.concatenate((np.zeros((half, num_channels), np.float32), data,
+                             np.zeros((taps, num_channels), np.float32)))
+    offsets = np.arange(taps) + 1  # relative to base - half, in padded coordinates
+
+    output = np.empty((num_out, num_channels), dtype = np.float32)
+    for c0 in range(0, num_out, chunk_frames):
+        n = np.arange(c0, min(c0 + chunk_frames, num_out), dtype = np.int64)
+        pos = n * down
+        base, phase = pos // up, pos % up
+        frames = padded[base[:, None] + offsets[None, :]]          # (n, taps, channels)
+        output[c0 : c0 + len(n)] = np.einsum('nk,nkc->nc', table[phase], frames)
+    return output
+
+# one row of filter weights per fractional phase. Row p, tap j weights input sample
+# base + j + 1 - taps/2 for an output at input position base + p / up
+def _polyphase_table(up, down, taps):
+    half = taps // 2
+    cutoff = min(1.0, up / down)  # relative to the input Nyquist frequency
+    frac = np.arange(up)[:, None] / up
+    t = frac - (np.arange(taps)[None, :] + 1 - half)
+    beta = 8.0
+    window = np.i0(beta * np.sqrt(np.clip(1 - (t / half) ** 2, 0, 1))) / np.i0(beta)
+    table = cutoff * np.sinc(cutoff * t) * window
+    table /= table.sum(axis = 1, keepdims = True)
+    return table.astype(np.float32)
+
+def read_wave_header(f):
+    """
+    Reads the RIFF header of a wave file.
+
+    :param f: A binary file object, positioned at the start of the file.
+
+    :returns: A tuple ``(fmt, data_offset, data_size)``. `fmt` is a dictionary with keys
+        ``format_tag``, ``num_channels``, ``sr``, ``sampwidth`` and ``bits``. The data chunk
+        starts *data_offset* bytes into the file and is *data_size* bytes long.
+    """
+    riff, riff_size, wave_id = struct.unpack('<4sI4s', f.read(12))
+    if riff != b'RIFF' or wave_id != b'WAVE':
+        raise ValueError('not a RIFF/WAVE file')
+
+    fmt = None
+    pos = 12
+    while True:
+        header = f.read(8)
+        if len(header) < 8:
+            raise ValueError('wave file has no data chunk')
+        chunk_id, size = struct.unpack('<4sI', header)
+        pos += 8
+        if chunk_id == b'fmt ':
+            body = f.read(size)
+            format_tag, num_channels, sr, _, _, bits = struct.unpack('<HHIIHH', body[:16])
+            # WAVE_FORMAT_EXTENSIBLE: the real format is in the sub-format GUID
+            if format_tag == 0xFFFE and len(body) >= 26:
+                format_tag = struct.unpack('<H', body[24:26])[0]
+            fmt = {'format_tag': format_tag, 'num_channels': num_channels, 'sr': sr,
+                   'sampwidth': (bits + 7) // 8, 'bits': bits}
+        elif chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('wave file has no fmt chunk before its data')
+            return fmt, pos, size
+        # chunks are word-aligned
+        pos += size + (size & 1)
+        f.seek(pos)
+
 class WaveBuffer(object):
     """
     Reads certain data from a wave file and stores it in memory.
 
     This is a WaveSource -- a wave data providing interface. Call :meth:`get_frames()`
     to get audio data in the format we like *(numpy array, float)*.
+
+    The decoded data comes from the process-wide :data:`g_sample_cache`, so buffers for the same
+    region of the same file share one read-only array, and rebuilding them skips decoding.
     """
     def __init__(self, filepath, start_frame, num_frames):
         """
-        :param filepath: The path to the wave file. Should be a 16 bit file with a sample rate of 44100Hz.
+        :param filepath: The path to the wave file. May be 8, 16, 24 or 32 bit integer PCM or
+            32/64 bit float, at any sample rate; it is resampled to Audio.sample_rate.
         :param start_frame: The frame of the wave file that this buffer should start on.
         :param num_frames: The length, in frames, this buffer should be.
         """
         super(WaveBuffer, self).__init__()
 
-        # get a local copy of the audio data from WaveFile
-        wr = WaveFile(filepath)
-        self.data = wr.get_frames(start_frame, num_frames)
-        self.num_channels = wr.get_num_channels()
+        self.data, self.num_channels = g_sample_cache.get(filepath, start_frame, num_frames)
 
     # start and end args are in units of frames,
     # so take into account num_channels when accessing sample data
@@ -107,6 +385,260 @@ class WaveBuffer(object):
         return self.num_channels
 
 
+class SampleCache(object):
+    """
+    Least-recently-used cache of decoded float32 sample data, keyed by
+    *(path, mtime, start_frame, num_frames)*. Cached arrays are read-only since they are shared.
+    """
+    def __init__(self, max_bytes = 64 * 1024 * 1024):
+        """
+        :param max_bytes: Byte budget. The least recently used entries are evicted to stay under it.
+        """
+        super(SampleCache, self).__init__()
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.num_bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, filepath, start_frame, num_frames):
+        """
+        Gets a region of a wave file, decoding it only if it isn't cached already.
+
+        :param filepath: The path to the wave file (or a file-like object, which is never cached).
+        :param start_frame: The first frame of the region.
+        :param num_frames: The length of the region, in frames.
+
+        :returns: A tuple ``(data, num_channels)``. `data` is a read-only interleaved float32 array.
+        """
+        if not isinstance(filepath, (str, bytes, os.PathLike)):
+            return self._decode(filepath, start_frame, num_frames)
+
+        path = os.path.abspath(filepath)
+        key = (path, os.stat(path).st_mtime_ns, start_frame, num_frames)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            self.entries.move_to_end(key)
+            return entry
+
+        self.misses += 1
+        entry = self._decode(path, start_frame, num_frames)
+        self.entries[key] = entry
+        self.num_bytes += entry[0].nbytes
+        self._evict()
+        return entry
+
+    def set_budget(self, max_bytes):
+        """
+        Changes the byte budget, evicting entries right away if needed.
+
+        :param max_bytes: The new byte budget.
+        """
+        self.max_bytes = max_bytes
+        self._evict()
+
+    def clear(self):
+        """
+        Removes all entries. Hit and miss counters are kept.
+        """
+        self.entries.clear()
+        self.num_bytes = 0
+
+    def get_stats(self):
+        """
+        :returns: A dictionary with ``hits``, ``misses``, ``entries``, ``bytes`` and ``max_bytes``.
+        """
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self.entries),
+                'bytes': self.num_bytes, 'max_bytes': self.max_bytes}
+
+    def _decode(self, filepath, start_frame, num_frames):
+        wr = WaveFile(filepath)
+        buf = np.empty(num_frames * wr.get_num_channels(), dtype=np.float32)
+        data = wr.get_frames(start_frame, num_frames, buf)
+        # region ran past the end of the file: don't keep the unused tail around
+        data = buf if len(data) == len(buf) else data.copy()
+        data.flags.writeable = False
+        return (data, wr.get_num_channels())
+
+    # drop least recently used entries until we fit in the budget
+    def _evict(self):
+        while self.num_bytes > self.max_bytes and self.entries:
+            key, (data, _) = self.entries.popitem(last=False)
+            self.num_bytes -= data.nbytes
+
+
+# the process-wide decoded-sample cache used by WaveBuffer
+g_sample_cache = SampleCache()
+
+
+class WaveStream(object):
+    """
+    Streams a long wave file (eg, a full-length backing track). A background thread reads
+    ahead of the play position into a fixed-size ring of decoded float32 blocks, so
+    :meth:`get_frames` never touches the disk and memory use does not depend on the file's length.
+
+    This is a WaveSource -- a wave data providing interface. If the reader falls behind,
+    :meth:`get_frames` fills the missing frames with silence and counts a starvation event
+    instead of blocking.
+    """
+    def __init__(self, filepath, block_frames = 4096, num_blocks = 16):
+        """
+        :param filepath: The path to the wave file. May be 8, 16, 24 or 32 bit integer PCM or
+            32/64 bit float, at any sample rate; it is resampled to Audio.sample_rate.
+        :param block_frames: The number of frames in each block of the ring.
+        :param num_blocks: The number of blocks in the ring. The read-ahead is
+            *block_frames * num_blocks* frames.
+        """
+        super(WaveStream, self).__init__()
+
+        self.wave = WaveFile(filepath)
+        self.num_channels = self.wave.get_num_channels()
+        self.end = self.wave.end
+        self.block_frames = block_frames
+        self.num_blocks = num_blocks
+
+        # ring[slot] holds block number slot_block[slot], or garbage if slot_block[slot] is -1
+        self.ring = np.zeros((num_blocks, block_frames * self.num_channels), dtype=np.float32)
+        self.slot_block = [-1] * num_blocks
+        self.read_block = 0   # first block the consumer may still ask for
+        self.next_frame = 0   # frame expected by the next sequential get_frames() call
+
+        self.starvation_count = 0
+        self.starved_frames = 0
+
+        self.cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self._read_loop, name='WaveStream', daemon=True)
+        self.thread.start()
+
+    def seek(self, frame, warmup_blocks = 2, timeout = 1.0):
+        """
+        Moves the read-ahead window to *frame*. Call this from the UI thread before playback
+        (re)starts from a new position, so the first blocks are ready by the time audio asks for them.
+
+        :param frame: The frame to prefetch from.
+        :param warmup_blocks: Number of blocks to wait for. 0 returns immediately.
+        :param timeout: Maximum time to wait, in seconds.
+
+        :returns: True if the warm-up blocks are ready.
+        """
+        first = min(max(frame, 0), self.end) // self.block_frames
+        last = min(first + min(warmup_blocks, self.num_blocks), self._num_file_blocks())
+        with self.cond:
+            self._move_window(frame)
+            self.cond.notify_all()
+            return self.cond.wait_for(lambda: all(self._has_block(b) for b in range(first, last)), timeout)
+
+    def get_frames(self, start_frame, num_frames):
+        """
+        Gets a range of frames of audio data from the ring. Does not block.
+
+        :param start_frame: The frame of the wave file to start on.
+        :param num_frames: The number of frames to read.
+
+        :returns: A numpy array of audio data, starting from *start_frame* in the wave file.
+            Array length is *num_frames*, but could be smaller if more frames are asked for than are available.
+        """
+        start_frame = min(max(start_frame, 0), self.end)
+        end_frame = min(start_frame + num_frames, self.end)
+        nc = self.num_channels
+        output = np.empty((end_frame - start_frame) * nc, dtype=np.float32)
+
+        with self.cond:
+            if start_frame != self.next_frame:
+                self._move_window(start_frame)
+            starved = 0
+            frame = start_frame
+            while frame < end_frame:
+                block = frame // self.block_frames
+                offset = frame - block * self.block_frames
+                n = min(end_frame - frame, self.block_frames - offset)
+                o = (frame - start_frame) * nc
+                if self._has_block(block):
+                    slot = block % self.num_blocks
+                    output[o : o + n * nc] = self.ring[slot, offset * nc : (offset + n) * nc]
+                else:
+                    output[o : o + n * nc] = 0
+                    starved += n
+                frame += n
+
+            if starved:
+                self.starvation_count += 1
+                self.starved_frames += starved
+
+            # blocks before the one we are in can now be reused
+            self.read_block = end_frame // self.block_frames
+            self.next_frame = end_frame
+            self.cond.notify_all()
+
+        return output
+
+    def get_num_channels(self):
+        """
+        :returns: The number of channels of the wave file.
+        """
+        return self.num_channels
+
+    def get_stats(self):
+        """
+        :returns: A dictionary with ``starvation_count`` (number of get_frames() calls that hit
+            missing data), ``starved_frames`` (total frames replaced by silence) and
+            ``ready_blocks`` (blocks currently prefetched ahead of the play position).
+        """
+        with self.cond:
+            ready = sum(1 for b in range(self.read_block, self.read_block + self.num_blocks) if self._has_block(b))
+            return {'starvation_count': self.starvation_count,
+                    'starved_frames': self.starved_frames,
+                    'ready_blocks': ready}
+
+    def close(self):
+        """
+        Stops the background reader thread.
+        """
+        with self.cond:
+            self.running = False
+            self.cond.notify_all()
+        self.thread.join()
+
+    def _num_file_blocks(self):
+        return (self.end + self.block_frames - 1) // self.block_frames
+
+    # must be called with self.cond held
+    def _has_block(self, block):
+        return self.slot_block[block % self.num_blocks] == block
+
+    # must be called with self.cond held
+    def _move_window(self, frame):
+        self.read_block = frame // self.block_frames
+        self.next_frame = frame
+
+    # must be called with self.cond held. Returns the next block to fill, or None.
+    def _next_missing_block(self):
+        last = min(self.read_block + self.num_blocks, self._num_file_blocks())
+        for block in range(self.read_block, last):
+            if not self._has_block(block):
+                return block
+        return None
+
+    def _read_loop(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: not self.running or self._next_missing_block() is not None)
+                if not self.running:
+                    return
+                block = self._next_missing_block()
+                slot = block % self.num_blocks
+                # claim the slot, so the consumer won't read it while we write into it
+                self.slot_block[slot] = -1
+
+            # decode outside the lock: this is where the disk gets touched
+            self.wave.get_frames(block * self.block_frames, self.block_frames, out = self.ring[slot])
+
+            with self.cond:
+                self.slot_block[slot] = block
+                self.cond.notify_all()
+
 
 # simple class to hold a region: name, start frame, length (in frames)
 from collections import namedtuple
@@ -7,20 +7,33 @@
 
 import numpy as np
 import os.path
+import queue
+import struct
+import threading
 import wave
 from .audio import Audio
 
 class AudioWriter(object):
     """Class for recording audio data. To use, create an AudioWriter, and pass its method
         :meth:`add_audio` into Audio's `listen_func`. See :class:`imslib.audio.Audio`.
+
+        By default, all audio is kept in memory and written when recording stops. In streaming
+        mode, buffers are handed to a background thread that writes them to disk as they arrive,
+        so memory use stays bounded and :meth:`stop` does not stall on a large write.
     """
 
-    def __init__(self, filebase, num_channels = 1):
+    def __init__(self, filebase, num_channels = 1, streaming = False, max_queued_buffers = 256):
         """
         :param filebase: The name of the file to output (without the extension). File extension
             is added automatically.
 
         :param num_channels: When writing the wave file, write with this many channels
+
+        :param streaming: If True, write to disk on a background thread while recording.
+
+        :param max_queued_buffers: In streaming mode, the number of buffers that may wait for the
+            writer thread. If the disk can't keep up and the queue is full, new buffers are dropped
+            and counted in `dropped_buffers`.
         """
         super(AudioWriter, self).__init__()
         self.active = False
@@ -28,6 +41,11 @@ class AudioWriter(object):
         self.filebase = filebase
         self.num_channels = num_channels
 
+        self.streaming = streaming
+        self.max_queued_buffers = max_queued_buffers
+        self.stream_writer = None
+        self.dropped_buffers = 0
+
     def add_audio(self, data, num_channels):
         """Function to add more audio into AudioWriter's internal buffer.
 
@@ -38,7 +56,11 @@ class AudioWriter(object):
         if self.active:
             # convert audio from num_channels to the # channels selected for writing
             data = convert_channels(data, num_channels, self.num_channels)
-            self.buffers.append(data)
+            if self.stream_writer:
+                if not self.stream_writer.add(data):
+                    self.dropped_buffers += 1
+            else:
+                self.buffers.append(data)
 
     def toggle(self):
         """
@@ -59,6 +81,11 @@ class AudioWriter(object):
             print('AudioWriter: start capture')
             self.active = True
             self.buffers = []
+            self.dropped_buffers = 0
+            if self.streaming:
+                filename = self._get_filename('wav')
+                print('AudioWriter: streaming to', filename)
+                self.stream_writer = WaveStreamWriter(filename, self.num_channels, self.max_queued_buffers)
 
     def stop(self):
         """
@@ -69,6 +96,14 @@ class AudioWriter(object):
             print('AudioWriter: stop capture')
             self.active = False
 
+            if self.stream_writer:
+                num_samples = self.stream_writer.close()
+                print('AudioWriter: saved', num_samples, 'samples in', self.stream_writer.filename)
+                if self.dropped_buffers:
+                    print('AudioWriter: dropped', self.dropped_buffers, 'buffers (disk too slow)')
+                self.stream_writer = None
+                return
+
             output = combine_buffers(self.buffers)
             if len(output) == 0:
                 print('AudioWriter: empty buffers. Nothing to write')
@@ -89,6 +124,92 @@ class AudioWriter(object):
                 suffix += 1
 
 
+class WaveStreamWriter(object):
+    """
+    Writes a 16 bit wave file incrementally from a background thread. Buffers are passed in
+    through a bounded queue, converted to int16 in chunks, and appended to the file. The RIFF
+    header is written with placeholder sizes and patched by :meth:`close`.
+    """
+
+    def __init__(self, filename, num_channels, max_queued_buffers = 256, chunk_samples = 65536):
+        """
+        :param filename: Name of output file to write
+        :param num_channels: Number of channels of interleaved audio data
+        :param max_queued_buffers: Capacity of the queue between :meth:`add` and the writer thread.
+        :param chunk_samples: Convert and write once at least this many samples are pending.
+        """
+        super(WaveStreamWriter, self).__init__()
+        self.filename = filename
+        self.num_channels = num_channels
+        self.chunk_samples = chunk_samples
+        self.num_samples = 0
+
+        self.file = open(filename, 'wb')
+        _write_wave_header(self.file, num_channels, 0)
+
+        self.queue = queue.Queue(maxsize = max_queued_buffers)
+        self.thread = threading.Thread(target = self._write_loop, name = 'WaveStreamWriter', daemon = True)
+        self.thread.start()
+
+    def add(self, data):
+        """
+        Queues a buffer for writing. Never blocks.
+
+        :param data: Interleaved float audio data in the range [-1, 1].
+
+        :returns: False if the queue was full and the buffer was dropped.
+        """
+        try:
+            self.queue.put_nowait(np.array(data, dtype = np.float32))
+            return True
+        except queue.Full:
+            return False
+
+    def close(self):
+        """
+        Writes any queued audio, patches the header, and closes the file.
+
+        :returns: The total number of samples written.
+        """
+        self.queue.put(None)
+        self.thread.join()
+
+        self.file.seek(0)
+        _write_wave_header(self.file, self.num_channels, self.num_samples // self.num_channels)
+        self.file.close()
+        return self.num_samples
+
+    def _write_loop(self):
+        pending = []
+        pending_samples = 0
+        while True:
+            data = self.queue.get()
+            if data is not None:
+                pending.append(data)
+                pending_samples += len(data)
+            if pending and (data is None or pending_samples >= self.chunk_samples):
+                self._write_chunk(combine_buffers(pending))
+                pending = []
+                pending_samples = 0
+            if data is None:
+                return
+
+    def _write_chunk(self, buf):
+        buf = np.clip(buf * (2**15), -2**15, 2**15 - 1).astype('<i2')
+        self.file.write(buf.tobytes())
+        self.num_samples += len(buf)
+
+
+# writes a canonical 44 byte PCM header for a 16 bit file with num_frames frames
+def _write_wave_header(f, num_channels, num_frames):
+    data_size = num_frames * num_channels * 2
+    f.write(struct.pack('<4sI4s4sIHHIIHH4sI',
+                        b'RIFF', 36 + data_size, b'WAVE',
+                        b'fmt ', 16, 1, num_channels, Audio.sample_rate,
+                        Audio.sample_rate * num_channels * 2, num_channels * 2, 16,
+                        b'data', data_size))
+
+
 def write_wave_file(buf, num_channels, filename):
     """Write a Wave File
 
@@ -0,0 +1,73 @@
+import glob
+import json
+import os
+import threading
+
+LEVEL_DIR = "level_data"
+METADATA_PATTERN = os.path.join("*", "level_metadata.json")   # one per level folder, inside LEVEL_DIR
+
+class LevelIndex(object):
+    """
+    Finds the installed levels by scanning ``level_data/*/level_metadata.json``.
+
+    Each metadata file maps level names to their metadata. The index remembers what it read
+    from every file along with the file's modification time and size, and only reads files
+    that are new or have changed since, so rescanning is just a directory listing and a stat
+    per file. With a `store` (a ProfileStore), the index is kept across runs too, so startup
+    does not read every file again either.
+
+    When several files describe the same level, the one whose path sorts last wins.
+
+    :param level_dir: Folder holding one folder per level.
+    :param store: Optional ProfileStore to keep the index in.
+    """
+    def __init__(self, level_dir = LEVEL_DIR, store = None):
+        super(LevelIndex, self).__init__()
+        self.level_dir = level_dir
+        self.store = store
+        self.lock = threading.Lock()
+        self.files = store.get_level_files() if store else {}   # path -> (mtime_ns, size, {name: meta})
+
+    def scan(self):
+        """
+        Rescans the level folder, reading only new and changed metadata files. Safe to call
+        from a background thread.
+
+        :returns: ``(levels, changed)``: ``{name: meta}`` of every level found, and whether any
+            metadata file was added, changed or removed since the last scan.
+        """
+        with self.lock:
+            found = {}
+            for path in glob.glob(os.path.join(self.level_dir, METADATA_PATTERN)):
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue   # removed while scanning
+                found[path] = (st.st_mtime_ns, st.st_size)
+
+            updated = {}
+            for path, (mtime_ns, size) in found.items():
+                cached = self.files.get(path)
+                if cached is not None and cached[:2] == (mtime_ns, size):
+                    continue
+                try:
+                    with open(path, 'r') as f:
+                        levels = json.load(f)
+                except (OSError, ValueError) as e:
+                    print("ERROR : could not read", path, ":", e)
+                    levels = {}
+                updated[path] = (mtime_ns, size, levels)
+
+            removed = [path for path in self.files if path not in found]
+            for path in removed:
+                del self.files[path]
+            self.files.update(updated)
+
+            if self.store and (updated or removed):
+                self.store.set_level_files(updated, removed)
+
+            # copies, so callers can change them (e.g. update scores) without touching the index
+            levels = {}
+            for path in sorted(self.files):
+                levels.update((name, dict(meta)) for name, meta in self.files[path][2].items())
+            return levels, bool(updated or removed)
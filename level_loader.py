@@ -0,0 +1,166 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from constants import GROUND_HEIGHT
+from level_model import LevelModel
+
+# music (and with it pyaudio, fluidsynth and the rest of the audio stack) is imported on first
+# use, so the menus can come up without it. See warm_up_audio().
+
+class PreparedLevel(object):
+    """
+    The parts of a level that can be loaded away from the main thread: the parsed level and
+    song files, the obstacle model and (optionally) the song's Synth with its SoundFont loaded.
+    MainWidget only has to create the Kivy graphics and the audio stream from it.
+    """
+    def __init__(self, level_file, song_base_path, level_data, midi_data, model, synth = None):
+        self.level_file = level_file
+        self.song_base_path = song_base_path
+        self.level_data = level_data
+        self.midi_data = midi_data
+        self.model = model
+        self.synth = synth
+
+    def release(self):
+        """
+        Frees the preloaded Synth, if it was not taken.
+        """
+        synth = self.take_synth()
+        if synth is not None:
+            synth.delete()
+
+    def take_synth(self):
+        """
+        :returns: The preloaded Synth (or ``None``). A synth can only drive one game, so it is
+            handed out once.
+        """
+        synth, self.synth = self.synth, None
+        return synth
+
+def prepare_level(level_file, song_base_path, progress = None, load_audio = True):
+    """
+    Loads everything for a level that does not need the main thread. Safe to run on a
+    background thread.
+
+    :param progress: Optional ``progress(fraction, text)``, called (on the calling thread) as
+        loading advances.
+    :param load_audio: Whether to create the Synth (the slowest step).
+
+    :returns: A PreparedLevel.
+    """
+    from music import index_notes, load_synth
+
+    def report(fraction, text):
+        if progress:
+            progress(fraction, text)
+
+    report(0.0, "Reading level")
+    with open(level_file, 'r') as f:
+        level_data = json.load(f)
+
+    report(0.2, "Building obstacles")
+    model = LevelModel(level_data, GROUND_HEIGHT)
+
+    report(0.35, "Reading song")
+    with open(song_base_path, 'r') as f:
+        midi_data = json.load(f)
+
+    report(0.5, "Indexing notes")
+    index_notes(midi_data.get('notes_by_tick', {}))
+
+    synth = None
+    if load_audio:
+        report(0.6, "Loading instruments")
+        synth = load_synth(midi_data)
+
+    report(1.0, "Ready")
+    return PreparedLevel(level_file, song_base_path, level_data, midi_data, model, synth)
+
+def warm_up_audio():
+    """
+    Imports the audio modules and initializes the audio device, so the first level does not
+    wait for them. Blocks, so call it on a background thread.
+    """
+    import music   # pulls in pyaudio, fluidsynth and the imslib audio modules
+    from imslib.audio import warm_up
+    warm_up()
+
+class LevelCache(object):
+    """
+    A small LRU of prepared levels, keyed by the paths and modification times of the level
+    and song files (so edited files are reloaded). Lets a level be prepared speculatively,
+    e.g. as soon as it is selected, and then started without waiting.
+
+    A game takes the Synth with ``get(..., take_synth=True)``, under the entry's lock, so the
+    cache never deletes a synth that has been handed out. Synths still held by evicted levels
+    are deleted.
+    """
+    def __init__(self, max_levels = 3):
+        super(LevelCache, self).__init__()
+        self.max_levels = max_levels
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()   # key -> _CacheEntry
+
+    def get_key(self, level_file, song_base_path):
+        return tuple((os.path.abspath(p), os.stat(p).st_mtime_ns) for p in (level_file, song_base_path))
+
+    def get(self, level_file, song_base_path, progress = None, load_audio = True, take_synth = False):
+        """
+        Returns the prepared level, preparing it first if it is not cached (see
+        prepare_level). Blocks, so call it on a background thread. If another thread is
+        already preparing the same level, waits for it and shares the result.
+
+        :param take_synth: Hand the Synth over to the caller: the result is a PreparedLevel of
+            its own that owns the synth, and the cached level keeps none (the next get()
+            loads another). Use it when starting a game, so eviction can't delete the synth
+            before the game takes it.
+        """
+        key = self.get_key(level_file, song_base_path)
+        evicted = []
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                entry = self.entries[key] = _CacheEntry()
+                while len(self.entries) > self.max_levels:
+                    evicted.append(self.entries.popitem(last=False)[1])
+            self.entries.move_to_end(key)
+        for old_entry in evicted:
+            old_entry.release()
+
+        with entry.lock:
+            if entry.prepared is None:
+                entry.prepared = prepare_level(level_file, song_base_path, progress, load_audio)
+            elif load_audio and entry.prepared.synth is None:
+                # the last game took the synth; load another for the next one
+                if progress:
+                    progress(0.6, "Loading instruments")
+                from music import load_synth
+                entry.prepared.synth = load_synth(entry.prepared.midi_data)
+            if progress:
+                progress(1.0, "Ready")
+            prepared = entry.prepared
+            if take_synth:
+                prepared = PreparedLevel(prepared.level_file, prepared.song_base_path, prepared.level_data,
+                                         prepared.midi_data, prepared.model, prepared.take_synth())
+            return prepared
+
+    def clear(self):
+        with self.lock:
+            entries = list(self.entries.values())
+            self.entries.clear()
+        for entry in entries:
+            entry.release()
+
+class _CacheEntry(object):
+    def __init__(self):
+        self.lock = threading.Lock()   # held while the level is being prepared
+        self.prepared = None
+
+    def release(self):
+        # waits for a get() in progress, so its synth is neither leaked nor deleted after
+        # being handed out
+        with self.lock:
+            if self.prepared is not None:
+                self.prepared.release()
@@ -0,0 +1,220 @@
+import numpy as np
+
+from constants import SLICE_WIDTH, GROUND_HEIGHT
+
+# collision classes returned by classify(). CTYPE_NAMES[c] is a readable name for each
+CTYPE_NONE   = 0
+CTYPE_TOP    = 1
+CTYPE_BOTTOM = 2
+CTYPE_SIDE   = 3
+CTYPE_SPIKE  = 4
+CTYPE_NAMES  = ('none', 'top', 'bottom', 'side', 'spike')
+
+# obstacle kinds (index into KIND_NAMES). Anything unknown is treated as 'empty'
+KIND_NAMES = ('empty', 'spikes', 'tower', 'towerWithSpikes', 'floatingSquare', 'floatingSquareWithSpikes')
+KIND_EMPTY, KIND_SPIKES, KIND_TOWER, KIND_TOWER_SPIKES, KIND_FLOATING, KIND_FLOATING_SPIKES = range(6)
+
+# geometry (also used by ObstacleChunk in obstacles.py to draw the obstacles)
+BLOCK_HEIGHT          = 40  # one unit of tower height
+EMPTY_HEIGHT          = 10
+SPIKES_HEIGHT         = 50
+TOWER_SPIKE_HEIGHT    = 30
+FLOATING_SIZE         = 40
+FLOATING_STEP         = 50  # floating squares sit height * FLOATING_STEP above the ground
+FLOATING_SPIKE_HEIGHT = 20
+TOWER_EPSILON         = 5   # how close the player's edge must be to a top/bottom to land/bump
+FLOATING_EPSILON      = 20
+
+class LevelModel(object):
+    """
+    Kivy-free model of a level's obstacles, stored as parallel NumPy arrays (one entry per
+    obstacle, sorted by slice) so collisions can be classified for many obstacles, or many
+    players, in one call.
+
+    All coordinates are world coordinates: x grows with the slice index (an obstacle covers
+    ``[slice_idx * SLICE_WIDTH, (slice_idx + 1) * SLICE_WIDTH)``) and y starts at the ground.
+    To compare with a player drawn on screen, add ``scroll_x`` to its x.
+
+    Per obstacle:
+      - ``slice_idx``, ``kind`` (index into KIND_NAMES), ``color_idx`` (index into ``colors``)
+      - ``solid``: ``(x0, y0, x1, y1)`` of the part the player can stand on / bump into
+      - ``spike``: ``(x0, y0, x1, y1)`` of the part that kills on contact
+      - ``has_solid``, ``has_spike``: whether those boxes take part in collisions
+      - ``spike_down``: the spikes hang below the solid part instead of pointing up
+      - ``epsilon``: landing / head-bump tolerance
+      - ``landable``: False if landing on top counts as a side hit (spiked towers)
+      - ``always_top``: any overlap is a landing, unless the player is moving up (the 'empty'
+        floor pads)
+    """
+    def __init__(self, level_data, ground_y = GROUND_HEIGHT):
+        super(LevelModel, self).__init__()
+
+        items = sorted((int(k), v) for k, v in level_data.items())
+        n = len(items)
+
+        self.ground_y   = ground_y
+        self.slice_idx  = np.fromiter((k for k, _ in items), dtype=np.int64, count=n)
+        self.kind       = np.zeros(n, dtype=np.int8)
+        self.color_idx  = np.zeros(n, dtype=np.int32)
+        self.solid      = np.zeros((n, 4))
+        self.spike      = np.zeros((n, 4))
+        self.has_solid  = np.zeros(n, dtype=bool)
+        self.has_spike  = np.zeros(n, dtype=bool)
+        self.spike_down = np.zeros(n, dtype=bool)
+        self.epsilon    = np.zeros(n)
+        self.landable   = np.ones(n, dtype=bool)
+        self.always_top = np.zeros(n, dtype=bool)
+
+        # colors as they appear in the level file, so results compare equal to the JSON values
+        self.colors = []
+        color_keys = {}
+
+        x0 = self.slice_idx * float(SLICE_WIDTH)
+        for i, (_, data) in enumerate(items):
+            kind = _kind_of(data.get('type', 'empty'))
+            self.kind[i] = kind
+            self._init_geometry(i, kind, data, ground_y)
+
+            # spiked obstacles are always drawn white
+            color = (1, 1, 1) if kind in (KIND_TOWER_SPIKES, KIND_FLOATING_SPIKES) else data.get('color', (1, 1, 1))
+            key = tuple(color)
+            if key not in color_keys:
+                color_keys[key] = len(self.colors)
+                self.colors.append(color)
+            self.color_idx[i] = color_keys[key]
+
+        self.solid[:, 0] = x0
+        self.solid[:, 2] = x0 + SLICE_WIDTH
+        self.spike[:, 0] = x0
+        self.spike[:, 2] = x0 + SLICE_WIDTH
+
+        # slice -> obstacle index, for lookups by position
+        self.index_of = {int(s): i for i, s in enumerate(self.slice_idx)}
+
+    def _init_geometry(self, i, kind, data, y):
+        n = data.get('height', 1)
+
+        if kind == KIND_EMPTY:
+            self.solid[i, 1:4:2] = (y, y + EMPTY_HEIGHT)
+            self.has_solid[i]  = True
+            self.always_top[i] = True
+
+        elif kind == KIND_SPIKES:
+            self.spike[i, 1:4:2] = (y, y + SPIKES_HEIGHT)
+            self.has_spike[i] = True
+
+        elif kind in (KIND_TOWER, KIND_TOWER_SPIKES):
+            top = y + n * BLOCK_HEIGHT
+            self.solid[i, 1:4:2] = (y, top)
+            self.has_solid[i] = True
+            self.epsilon[i]   = TOWER_EPSILON
+            if kind == KIND_TOWER_SPIKES:
+                self.spike[i, 1:4:2] = (top, top + TOWER_SPIKE_HEIGHT)
+                self.has_spike[i] = True
+                self.landable[i]  = False
+
+        else:
+            bottom = y + n * FLOATING_STEP
+            top = bottom + FLOATING_SIZE
+            self.solid[i, 1:4:2] = (bottom, top)
+            self.has_solid[i] = True
+            self.epsilon[i]   = FLOATING_EPSILON
+            if kind == KIND_FLOATING_SPIKES:
+                if data.get('spikesOnTop', True):
+                    self.spike[i, 1:4:2] = (top, top + FLOATING_SPIKE_HEIGHT)
+                else:
+                    self.spike[i, 1:4:2] = (bottom - FLOATING_SPIKE_HEIGHT, bottom)
+                    self.spike_down[i] = True
+                self.has_spike[i] = True
+                # only the spikes of a spiked floating square collide: its square can be
+                # passed through
+                self.has_solid[i] = False
+
+    def __len__(self):
+        return len(self.slice_idx)
+
+    def indices_in(self, x0, x1):
+        """
+        :param x0: Left edge of a world-space x range.
+        :param x1: Right edge of the range.
+
+        :returns: A ``slice`` of obstacle indices whose slices overlap ``[x0, x1]``.
+        """
+        lo = np.searchsorted(self.slice_idx, int(x0 // SLICE_WIDTH), 'left')
+        hi = np.searchsorted(self.slice_idx, int(x1 // SLICE_WIDTH), 'right')
+        return slice(lo, hi)
+
+    def classify(self, px, py, psize, vy, idx = slice(None)):
+        """
+        Classifies how a player touches each of the obstacles ``idx``:
+
+          - spike: the player overlaps a spike box (death)
+          - top: it overlaps a solid box, with its bottom within ``epsilon`` of the box's top
+            and vy <= 0 (a landing). Floor pads count any overlap with vy <= 0 as a landing
+            (and let a player moving up pass), and spiked towers turn landings into side hits
+          - bottom: it overlaps from below, with its top within ``epsilon`` of the box's
+            bottom and vy >= 0 (a head bump)
+          - side: any other overlap with a solid box (death)
+
+        Player arguments may be scalars or arrays. They broadcast against the selected
+        obstacles, so ``px[:, None]`` (shape ``(P, 1)``) tests P players against every
+        obstacle at once.
+
+        :param px: Player's left edge, in world coordinates.
+        :param py: Player's bottom edge.
+        :param psize: Player's width and height.
+        :param vy: Player's vertical velocity.
+        :param idx: Which obstacles to test: a slice, index array or boolean mask.
+
+        :returns: ``(ctype, top_y)``. ``ctype`` holds CTYPE_* codes. ``top_y`` is the y the
+            player should snap to for 'top' (its new bottom) and 'bottom' (its new top).
+        """
+        solid = self.solid[idx]
+        spike = self.spike[idx]
+        eps   = self.epsilon[idx]
+
+        left   = np.asarray(px, dtype=float)
+        bottom = np.asarray(py, dtype=float)
+        right  = left + psize
+        top    = bottom + psize
+        vy     = np.asarray(vy, dtype=float)
+
+        hit_spike = self.has_spike[idx] & _overlaps(spike, left, bottom, right, top)
+        hit_solid = self.has_solid[idx] & _overlaps(solid, left, bottom, right, top)
+
+        s_bottom = solid[:, 1]
+        s_top    = solid[:, 3]
+        on_top   = (np.abs(bottom - s_top) < eps) & (vy <= 0)
+        from_bot = (np.abs(top - s_bottom) < eps) & (vy >= 0)
+        # floor pads catch the player unless it is moving up, i.e. jumping off them
+        always   = self.always_top[idx] & (vy <= 0)
+
+        # resolved in reverse priority order, so the later np.where wins
+        ctype = np.where(from_bot, CTYPE_BOTTOM, CTYPE_SIDE)
+        ctype = np.where(on_top, np.where(self.landable[idx], CTYPE_TOP, CTYPE_SIDE), ctype)
+        ctype = np.where(always, CTYPE_TOP, ctype)
+        ctype = np.where(self.always_top[idx] & ~always, CTYPE_NONE, ctype)
+        ctype = np.where(hit_solid, ctype, CTYPE_NONE)
+        ctype = np.where(hit_spike, CTYPE_SPIKE, ctype).astype(np.int8)
+
+        top_y = np.where(always, s_bottom, np.where(on_top, s_top, s_bottom))
+        top_y = np.broadcast_to(top_y, ctype.shape)
+        return ctype, top_y
+
+    def color_of(self, i):
+        """
+        :returns: The level-file color of obstacle `i`.
+        """
+        return self.colors[self.color_idx[i]]
+
+
+def _kind_of(type_name):
+    try:
+        return KIND_NAMES.index(type_name)
+    except ValueError:
+        return KIND_EMPTY
+
+# strict AABB overlap between boxes (N, 4) and player edges (broadcastable to N)
+def _overlaps(boxes, left, bottom, right, top):
+    return ((right > boxes[:, 0]) & (left < boxes[:, 2]) &
+            (top > boxes[:, 1]) & (bottom < boxes[:, 3]))
@@ -1,43 +1,73 @@
-import json
+import os
 from kivy.clock import Clock
 from imslib.core import BaseWidget, run
 
 from music import AudioController
-from game import GameDisplay, PlayerController
+from game import GameDisplay
+from game_world import GameWorld, PlayerController, FixedTimestep
+from replay import InputRecorder, RECORD_DIR_ENV
+from level_loader import prepare_level
 
 class MainWidget(BaseWidget):
-    def __init__(self, level_name, level_data_path, song_base_path, screen_manager = None):
+    def __init__(self, level_name, level_data_path, song_base_path, screen_manager = None, speed = 1.0, prepared = None):
         super(MainWidget, self).__init__()
 
         self.screen_manager = screen_manager
         self.level_name = level_name
+        self.speed = speed  # < 1.0 in practice mode
 
-        # load JSON
-        with open(level_data_path, 'r') as f:
-            level_data = json.load(f)
+        # the level is normally prepared in the background (see level_loader.py)
+        if prepared is None:
+            prepared = prepare_level(level_data_path, song_base_path)
 
-        with open(song_base_path, 'r') as f:
-            midi_data = json.load(f)
+        self.audio_ctrl = AudioController(prepared.midi_data, speed, prepared.take_synth())
 
-        self.audio_ctrl = AudioController(midi_data)
-        
-
-        self.display = GameDisplay(level_name, level_data, self.audio_ctrl, screen_manager)
-        self.player_ctrl = PlayerController(self.display, self.audio_ctrl)
+        self.world = GameWorld(prepared.model, self.audio_ctrl, speed)
+        self.display = GameDisplay(level_name, self.world, screen_manager)
+        self.player_ctrl = PlayerController(self.world, self.audio_ctrl)
         self.canvas.add(self.display)
 
+        # physics runs in fixed steps, however often frames arrive
+        self.timestep = FixedTimestep()
+
+        # log inputs and dts so the run can be replayed with replay.py
+        self.recorder = InputRecorder(level_name, level_data_path, song_base_path, speed)
+
         self.audio_started = False
         self.started= False
         self.counter_until_start = 0
+        self.closed = False
 
         
 
     def on_key_down(self, keycode, modifiers):
+        self.recorder.key_down(keycode[1])
         self.player_ctrl.on_key_down(keycode)
 
     def on_key_up(self, keycode):
+        self.recorder.key_up(keycode[1])
         self.player_ctrl.on_key_up(keycode)
 
+    def save_recording(self):
+        """
+        Saves this run's recording if recording is enabled (see replay.RECORD_DIR_ENV).
+        """
+        record_dir = os.environ.get(RECORD_DIR_ENV)
+        if record_dir and not self.recorder.saved:
+            self.recorder.finish(self.world)
+            print("INFO : recorded run to", self.recorder.save(record_dir))
+
+    def close(self):
+        """
+        Ends the game: stops its updates, closes its audio stream and frees its Synth.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        Clock.unschedule(self.update)
+        Clock.unschedule(self._update)
+        self.audio_ctrl.close()
+
     def on_resize(self, win_size):
         self.display.on_resize(win_size)
 
@@ -45,15 +75,25 @@ class MainWidget(BaseWidget):
         if not self.audio_started:
             self.audio_ctrl.start()
             self.audio_started = True
-        self.display.on_update(dt)
-        self.player_ctrl.on_update(dt)
+        if self.world.level_has_ended:
+            self.save_recording()
+            return
+
+        step = self.timestep.step
+        for _ in range(self.timestep.advance(dt)):
+            self.recorder.on_update(step)
+            self.world.on_update(step)
+            self.player_ctrl.on_update(step)
+            if self.world.level_has_ended:
+                break
+        self.display.draw(self.timestep.alpha)
 
     def on_update(self):
         if not self.started:
             self.counter_until_start += 1
             if self.counter_until_start > 10:
                 self.started = True
-                Clock.schedule_interval(self.update, 1/240.0)
+                Clock.schedule_interval(self.update, 0)  # every frame
 
         self.audio_ctrl.on_update()
 
@@ -1,22 +1,58 @@
 from imslib.audio import Audio
 from imslib.mixer import Mixer
 from imslib.synth import Synth
+from imslib.sf2 import find_subset
 from imslib.wavegen import WaveGenerator
 from imslib.wavesrc import WaveFile
 from constants import SLICE_WIDTH, SCROLL_SPEED
 
 from imslib.clock import Clock, SimpleTempoMap, AudioScheduler, tick_str, kTicksPerQuarter, quantize_tick_up
 
+def level_presets(midi_data):
+    """
+    Returns the set of (bank, preset) pairs that a level's synth will select: the programs of
+    every channel that plays, the drum kit on channel 9, and the default program that
+    Synth assigns to all channels upfront.
+    """
+    presets = {(0, 0), (128, 0)}
+    for channel_id, metadata in midi_data.get('channel_metadata', {}).items():
+        if metadata.get('play_track', 1) == 1:
+            presets.add((0, metadata.get('program', 0)))
+    return presets
+
+def index_notes(notes_by_tick):
+    """
+    Merges notes that are one tick late into the previous tick, so chords land together.
+    Works in place on ``midi_data['notes_by_tick']`` and returns it; running it again is a no-op.
+    """
+    keys =  list(notes_by_tick.keys())
+    #go through the notes which are index by tick in string, and if off by one tick add the contents to previsous tick so it is more unified
+    for tick in keys:
+        tick = int(tick)
+        if str(tick-1) in notes_by_tick:
+            notes_by_tick[str(tick-1)].extend(notes_by_tick[str(tick)])
+            del notes_by_tick[str(tick)]
+    return notes_by_tick
+
+def load_synth(midi_data):
+    """
+    Creates the Synth for a level, loading its SoundFont (slow; safe to call off the main thread).
+    """
+    # use the trimmed SoundFont for this level if one has been built (see trim_soundfont.py)
+    return Synth(find_subset(level_presets(midi_data)))
+
 # Handles everything about Audio.
 #   creates the main Audio fobject
 #   load and plays solo and bg audio tracks
 #   creates audio buffers for sound-fx (miss sound)
 #   functions as the clock (returns song time elapsed)
 class AudioController(object):
-    def __init__(self, midi_data):
+    def __init__(self, midi_data, speed = 1.0, synth = None):
         super(AudioController, self).__init__()
+        self.speed = speed
         self.audio = Audio(2)
-        self.synth = Synth()
+        # the synth may have been loaded in the background (see level_loader.py)
+        self.synth = synth or load_synth(midi_data)
        
 
         
@@ -30,7 +66,8 @@ class AudioController(object):
 
         self.playing = False
 
-        self.tempo_map  = SimpleTempoMap(self.midi_data["metadata"]["bpm"])
+        # slowing the tempo (rather than resampling the synth output) keeps the pitch in practice mode
+        self.tempo_map  = SimpleTempoMap(self.midi_data["metadata"]["bpm"] * self.speed)
         self.sched = AudioScheduler(self.tempo_map)
 
         self.audio.set_generator(self.sched)
@@ -58,14 +95,7 @@ class AudioController(object):
         self.channel_synths = {}
         self.bass_channels  = [9]
 
-        self.notes = midi_data.get('notes_by_tick', {})
-        keys =  list(self.notes.keys())
-        #go through the notes which are index by tick in string, and if off by one tick add the contents to previsous tick so it is more unified
-        for tick in keys:
-            tick = int(tick)
-            if str(tick-1) in self.notes:
-                self.notes[str(tick-1)].extend(self.notes[str(tick)])
-                del self.notes[str(tick)]
+        self.notes = index_notes(midi_data.get('notes_by_tick', {}))
 
         for channel_id, metadata in self.midi_data.get('channel_metadata', {}).items():
             # Only create synths for channels that are set to play
@@ -143,7 +173,7 @@ class AudioController(object):
         """
         Converts a slice number to time in seconds.
         """
-        return slice_num * SLICE_WIDTH / SCROLL_SPEED
+        return slice_num * SLICE_WIDTH / (SCROLL_SPEED * self.speed)
     
     def start(self):
         if self.playing:
@@ -163,9 +193,35 @@ class AudioController(object):
         # TODO set program and start playing.
 
     def stop(self):
+        """
+        Stops the song and silences the notes still playing. The audio stream and the Synth
+        are kept, so start() plays the song again from the top right away.
+        """
+        for channel, info in self.channel_synths.items():
+            for note in info['active_notes']:
+                self.synth.noteoff(channel, note)
+            info['active_notes'].clear()
 
-        self.sched.cancel(self.cmd)
-        self.__init__(self.midi_data) #reset the audio controller
+        # a new scheduler drops every pending note on / off
+        self.sched = AudioScheduler(self.tempo_map)
+        self.sched.set_generator(self.synth)
+        self.audio.set_generator(self.sched)
+
+        self.cmd = None
+        self.off_cmd = None
+        self.next_note_info = None
+        self.playing = False
+        self.change_volume(self.background_channels, 0.2)
+        self.change_volume(self.main_channels, 0.3)
+        self.change_volume(self.bass_channels, 0.5)
+
+    def close(self):
+        """
+        Stops the song, closes the audio stream and frees the Synth. Call when the game is over.
+        """
+        self.stop()
+        self.audio.close()
+        self.synth.delete()
 
     # start / stop the song
     def toggle(self):
@@ -0,0 +1,94 @@
+import threading
+import time
+
+class DebouncedWriter(object):
+    """
+    Coalesces saves and performs them on a background thread.
+
+    save() only records the latest value for a key, so it is cheap enough to call from the
+    frame loop. The writer thread writes pending values at most once every `min_interval`
+    seconds, or right away after flush().
+
+    :param write_func: Called on the writer thread as ``write_func(key, value)``.
+    :param min_interval: Minimum time (in seconds) between writes.
+    """
+    def __init__(self, write_func, min_interval = 2.0):
+        super(DebouncedWriter, self).__init__()
+        self.write_func = write_func
+        self.min_interval = min_interval
+
+        self.cond = threading.Condition()
+        self.pending = {}       # key -> latest value not yet written
+        self.flushing = False   # write pending values without waiting for min_interval
+        self.writing = False
+        self.closed = False
+        self.last_write = 0.0
+        self.thread = None
+
+    def save(self, key, value):
+        """
+        Schedules `value` to be written for `key`, replacing any value still pending.
+        """
+        with self.cond:
+            if self.closed:
+                raise RuntimeError('DebouncedWriter is closed')
+            self.pending[key] = value
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, daemon=True)
+                self.thread.start()
+            self.cond.notify_all()
+
+    def flush(self, wait = False, timeout = 5.0):
+        """
+        Writes pending values now instead of at the next interval.
+
+        :param wait: If True, blocks until they have been written (or `timeout` passes).
+        :returns: True if nothing is left to write.
+        """
+        with self.cond:
+            if self.pending:
+                self.flushing = True
+                self.cond.notify_all()
+            if wait:
+                self.cond.wait_for(lambda: not self.pending and not self.writing, timeout)
+            return not self.pending and not self.writing
+
+    def close(self, timeout = 5.0):
+        """
+        Writes anything pending and stops the writer thread. Call on exit.
+        """
+        self.flush(wait = True, timeout = timeout)
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def _run(self):
+        with self.cond:
+            while True:
+                self.cond.wait_for(lambda: self.pending or self.closed)
+                if not self.pending:
+                    return
+
+                delay = self.last_write + self.min_interval - time.monotonic()
+                if delay > 0 and not (self.flushing or self.closed):
+                    self.cond.wait(delay)
+                    continue
+
+                pending, self.pending = self.pending, {}
+                self.flushing = False
+                self.writing = True
+
+                self.cond.release()
+                try:
+                    for key, value in pending.items():
+                        try:
+                            self.write_func(key, value)
+                        except Exception as e:
+                            print("ERROR : could not save", key, ":", e)
+                finally:
+                    self.cond.acquire()
+                    self.writing = False
+                    self.last_write = time.monotonic()
+                    self.cond.notify_all()
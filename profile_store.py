@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+PROFILE_DB_ENV = "BEATBLITZ_DB"  # overrides where the player profile database lives
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS levels (
+    name            TEXT PRIMARY KEY,
+    high_score      INTEGER NOT NULL DEFAULT 0,
+    stars_collected INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS runs (
+    id          INTEGER PRIMARY KEY,
+    level       TEXT NOT NULL,
+    finished_at REAL NOT NULL,
+    score       INTEGER NOT NULL,
+    stars       INTEGER NOT NULL,
+    speed       REAL NOT NULL DEFAULT 1.0
+);
+CREATE INDEX IF NOT EXISTS runs_by_level_score ON runs (level, score DESC);
+CREATE INDEX IF NOT EXISTS runs_by_time ON runs (finished_at DESC);
+CREATE TABLE IF NOT EXISTS run_stats (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    name   TEXT NOT NULL,
+    value  REAL,
+    PRIMARY KEY (run_id, name)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS level_files (
+    path     TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size     INTEGER NOT NULL,
+    levels   TEXT NOT NULL
+);
+"""
+
+def get_default_path():
+    """
+    :returns: The profile database path: ``$BEATBLITZ_DB`` if set, else ``~/.beatblitz/profile.db``.
+    """
+    return os.environ.get(PROFILE_DB_ENV) or os.path.join(str(Path.home()), '.beatblitz', 'profile.db')
+
+class ProfileStore(object):
+    """
+    The player's profile in a local SQLite database (WAL mode): per-level best scores, the
+    history of every finished run with its stats, and the index of installed levels.
+
+    The connection is shared between threads (the game saves from a background writer), so
+    every access goes through a lock.
+    """
+    def __init__(self, path = None):
+        super(ProfileStore, self).__init__()
+        self.path = path or get_default_path()
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.execute('PRAGMA synchronous=NORMAL')   # durable enough for scores, and much faster
+        with self.db:
+            self.db.executescript(SCHEMA)
+
+    def seed_levels(self, levels):
+        """
+        Adds levels that are not in the database yet, taking their scores from `levels`
+        (``{name: meta}``, as loaded from the metadata files). Existing rows are left alone.
+        """
+        rows = [(name, meta.get('high_score', 0), meta.get('stars_collected', 0)) for name, meta in levels.items()]
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR IGNORE INTO levels (name, high_score, stars_collected) VALUES (?, ?, ?)', rows)
+
+    def get_level_scores(self):
+        """
+        :returns: ``{name: (high_score, stars_collected)}`` for every known level.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT name, high_score, stars_collected FROM levels').fetchall()
+        return {name: (high_score, stars) for name, high_score, stars in rows}
+
+    def set_level_scores(self, name, high_score, stars_collected):
+        with self.lock, self.db:
+            self.db.execute(
+                'INSERT INTO levels (name, high_score, stars_collected) VALUES (?, ?, ?) '
+                'ON CONFLICT (name) DO UPDATE SET high_score = excluded.high_score, '
+                'stars_collected = excluded.stars_collected',
+                (name, high_score, stars_collected))
+
+    def add_run(self, level, score, stars, speed = 1.0, stats = None, finished_at = None):
+        """
+        Records a finished run.
+
+        :param stats: Optional ``{name: number}`` of extra per-run stats (e.g. deaths).
+        :param finished_at: When the run finished (``time.time()``); defaults to now.
+        :returns: The id of the new run.
+        """
+        with self.lock, self.db:
+            cur = self.db.execute('INSERT INTO runs (level, finished_at, score, stars, speed) VALUES (?, ?, ?, ?, ?)',
+                                  (level, finished_at or time.time(), score, stars, speed))
+            run_id = cur.lastrowid
+            if stats:
+                self.db.executemany('INSERT INTO run_stats (run_id, name, value) VALUES (?, ?, ?)',
+                                    [(run_id, k, v) for k, v in stats.items()])
+        return run_id
+
+    def best_runs(self, level, limit = 10, speed = 1.0):
+        """
+        :returns: The `limit` highest scoring runs of `level` at `speed`, as
+            ``(id, finished_at, score, stars)`` tuples.
+        """
+        with self.lock:
+            return self.db.execute(
+                'SELECT id, finished_at, score, stars FROM runs WHERE level = ? AND speed = ? '
+                'ORDER BY score DESC LIMIT ?', (level, speed, limit)).fetchall()
+
+    def recent_runs(self, limit = 10):
+        """
+        :returns: The `limit` most recent runs, newest first, as
+            ``(id, level, finished_at, score, stars, speed)`` tuples.
+        """
+        with self.lock:
+            return self.db.execute(
+                'SELECT id, level, finished_at, score, stars, speed FROM runs '
+                'ORDER BY finished_at DESC LIMIT ?', (limit,)).fetchall()
+
+    def get_run_stats(self, run_id):
+        """
+        :returns: ``{name: value}`` of the stats recorded with run `run_id`.
+        """
+        with self.lock:
+            return dict(self.db.execute('SELECT name, value FROM run_stats WHERE run_id = ?', (run_id,)))
+
+    def get_level_files(self):
+        """
+        :returns: The level index saved by set_level_files(), as
+            ``{path: (mtime_ns, size, {name: meta})}``.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT path, mtime_ns, size, levels FROM level_files').fetchall()
+        return {path: (mtime_ns, size, json.loads(levels)) for path, mtime_ns, size, levels in rows}
+
+    def set_level_files(self, updated, removed = ()):
+        """
+        Saves the level index (see level_index.py).
+
+        :param updated: ``{path: (mtime_ns, size, {name: meta})}`` of new or changed metadata files.
+        :param removed: Paths of metadata files that no longer exist.
+        """
+        rows = [(path, mtime_ns, size, json.dumps(levels)) for path, (mtime_ns, size, levels) in updated.items()]
+        with self.lock, self.db:
+            self.db.executemany('DELETE FROM level_files WHERE path = ?', [(path,) for path in removed])
+            self.db.executemany('INSERT OR REPLACE INTO level_files (path, mtime_ns, size, levels) VALUES (?, ?, ?, ?)', rows)
+
+    def close(self):
+        with self.lock:
+            self.db.close()
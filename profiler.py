@@ -0,0 +1,142 @@
+import csv
+import os
+import time
+
+import numpy as np
+
+PROFILE_DIR_ENV = "BEATBLITZ_PROFILE_DIR"  # if set, profiled runs dump their timings here as csv
+
+class Profiler(object):
+    """
+    Times named sections of the game while enabled.
+
+    Sections are methods of live objects registered with watch(). Enabling replaces each one
+    with a timed wrapper on its instance, and disabling removes the wrapper again, so the
+    game runs its normal code (at no cost) while the profiler is off.
+
+    Keeps the last `window_size` times of every section for percentiles, and every sample
+    since enable() for dump_csv().
+    """
+    def __init__(self, window_size = 480):
+        self.enabled = False
+        self.window_size = window_size
+        self.targets = []   # (obj, method name, section)
+        self.recent = {}    # section -> ring buffer of recent times (ms)
+        self.counts = {}    # section -> number of samples written to the ring buffer
+        self.log = []       # (seconds since enable, section, ms)
+        self.t_start = 0.0
+
+        self.window = None
+        self._render_start = None
+
+    def watch(self, obj, method_name, section = None):
+        """
+        Adds ``obj.method_name`` as a profiled section.
+
+        :param section: Name to show; defaults to ``Class.method_name``.
+        """
+        section = section or f"{type(obj).__name__}.{method_name}"
+        self.targets.append((obj, method_name, section))
+        self._add_section(section)
+        if self.enabled:
+            self._wrap(obj, method_name, section)
+
+    def watch_render(self, window):
+        """
+        Adds the time Kivy spends drawing `window` (from on_draw to on_flip) as a section.
+        """
+        self.window = window
+        self._add_section('render')
+        if self.enabled:
+            self._bind_window()
+
+    def enable(self):
+        if self.enabled:
+            return
+        self.enabled = True
+        self.t_start = time.perf_counter()
+        self.log = []
+        for target in self.targets:
+            self._wrap(*target)
+        if self.window is not None:
+            self._bind_window()
+
+    def disable(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        for obj, method_name, _ in self.targets:
+            if method_name in obj.__dict__:
+                delattr(obj, method_name)
+        if self.window is not None:
+            self.window.unbind(on_draw=self._on_draw, on_flip=self._on_flip)
+            self._render_start = None
+
+    def toggle(self):
+        if self.enabled:
+            self.disable()
+        else:
+            self.enable()
+
+    def add_sample(self, section, ms):
+        count = self.counts[section]
+        self.recent[section][count % self.window_size] = ms
+        self.counts[section] = count + 1
+        self.log.append((time.perf_counter() - self.t_start, section, ms))
+
+    def get_stats(self):
+        """
+        :returns: ``{section: (p50, p95, p99)}`` in milliseconds over the recent samples of each
+            section, or ``None`` for sections with no samples yet.
+        """
+        stats = {}
+        for section, buf in self.recent.items():
+            n = min(self.counts[section], self.window_size)
+            stats[section] = tuple(np.percentile(buf[:n], (50, 95, 99))) if n else None
+        return stats
+
+    def dump_csv(self, path):
+        """
+        Writes every sample since the profiler was enabled to `path`, one ``time,section,ms``
+        row each.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(('time', 'section', 'ms'))
+            writer.writerows(self.log)
+        return path
+
+    def _add_section(self, section):
+        if section not in self.recent:
+            self.recent[section] = np.zeros(self.window_size)
+            self.counts[section] = 0
+
+    def _wrap(self, obj, method_name, section):
+        method = getattr(obj, method_name)
+        add_sample = self.add_sample
+        perf_counter = time.perf_counter
+
+        def timed(*args, **kwargs):
+            t0 = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                add_sample(section, (perf_counter() - t0) * 1000)
+
+        # instance attributes shadow the class method; Kivy's Clock looks callbacks up by name,
+        # so scheduled methods are profiled too
+        setattr(obj, method_name, timed)
+
+    def _bind_window(self):
+        self.window.bind(on_draw=self._on_draw, on_flip=self._on_flip)
+
+    def _on_draw(self, *_):
+        self._render_start = time.perf_counter()
+
+    def _on_flip(self, *_):
+        if self._render_start is not None:
+            self.add_sample('render', (time.perf_counter() - self._render_start) * 1000)
+            self._render_start = None
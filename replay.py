@@ -0,0 +1,144 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+from game_world import GameWorld, PlayerController
+from level_model import LevelModel
+
+RECORD_DIR_ENV = "BEATBLITZ_RECORD_DIR"  # if set, every run is recorded into this directory
+
+class InputRecorder(object):
+    """
+    Records a run so it can be replayed exactly: the dt of every simulation step, and every
+    key down / up with the step (and simulation time) at which it happened.
+    """
+    def __init__(self, level_name, level_file, song_base_path, speed=1.0):
+        self.data = {
+            "level_name": level_name,
+            "level_file": level_file,
+            "song_base_path": song_base_path,
+            "speed": speed,
+            "dt": [],
+            "events": [],   # [step, sim_time, "down" | "up", key]
+            "result": None,
+        }
+        self.sim_time = 0.0
+        self.saved = False
+
+    def on_update(self, dt):
+        self.data["dt"].append(dt)
+        self.sim_time += dt
+
+    def key_down(self, key):
+        self._event("down", key)
+
+    def key_up(self, key):
+        self._event("up", key)
+
+    def _event(self, kind, key):
+        self.data["events"].append([len(self.data["dt"]), self.sim_time, kind, key])
+
+    def finish(self, world):
+        self.data["result"] = {"score": world.score, "deaths": world.deaths}
+
+    def save(self, directory):
+        """Write the recording to a new json file in directory (only once). Returns the path."""
+        if self.saved:
+            return None
+        self.saved = True
+        os.makedirs(directory, exist_ok=True)
+        name = f"{self.data['level_name']}-{time.strftime('%Y%m%d-%H%M%S')}.json"
+        path = os.path.join(directory, name.replace(" ", "_"))
+        with open(path, 'w') as f:
+            json.dump(self.data, f)
+        return path
+
+class NullAudio(object):
+    """Stands in for AudioController during replay: gameplay only needs its callbacks."""
+    def death_callback(self):
+        pass
+
+    def ressurection_callback(self):
+        pass
+
+    def correct_jump_callback(self, jump_key, slice_num):
+        pass
+
+    def incorrect_jump_callback(self, jump_key, tick_num):
+        pass
+
+def replay(recording, fixed_dt=None):
+    """
+    Run a recorded level as fast as possible, without audio or a render loop.
+
+    With fixed_dt, the simulation steps by fixed_dt instead of the recorded dts, and each key
+    event is applied at the first step that reaches its recorded simulation time.
+
+    Returns a dict with the final score, deaths, number of steps and wall-clock time.
+    """
+    with open(recording["level_file"], 'r') as f:
+        level_data = json.load(f)
+
+    world = GameWorld(LevelModel(level_data), NullAudio(), recording.get("speed", 1.0))
+    player_ctrl = PlayerController(world, world.audio)
+
+    events = recording["events"]
+    if fixed_dt is None:
+        dts = recording["dt"]
+        event_steps = [e[0] for e in events]
+    else:
+        total = sum(recording["dt"])
+        dts = [fixed_dt] * int(round(total / fixed_dt))
+        event_steps = [int(round(e[1] / fixed_dt)) for e in events]
+
+    t_start = time.perf_counter()
+    e = 0
+    steps = 0
+    for i, dt in enumerate(dts):
+        while e < len(events) and event_steps[e] <= i:
+            key = ["", events[e][3]]
+            if events[e][2] == "down":
+                player_ctrl.on_key_down(key)
+            else:
+                player_ctrl.on_key_up(key)
+            e += 1
+        world.on_update(dt)
+        player_ctrl.on_update(dt)
+        steps += 1
+        if world.level_has_ended:
+            break
+
+    return {
+        "score": world.score,
+        "deaths": world.deaths,
+        "steps": steps,
+        "wall_time": time.perf_counter() - t_start,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay recorded Beat Blitz runs and check they reproduce')
+    parser.add_argument('recordings', nargs='+', help='Recording json files')
+    parser.add_argument('--fixed-dt', type=float, help='Step the simulation by this dt instead of the recorded ones')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay each recording this many times (for timing)')
+
+    args = parser.parse_args()
+
+    ok = True
+    for path in args.recordings:
+        with open(path, 'r') as f:
+            recording = json.load(f)
+        for _ in range(args.repeat):
+            result = replay(recording, args.fixed_dt)
+        expected = recording.get("result")
+        match = expected is None or (expected["score"] == result["score"] and expected["deaths"] == result["deaths"])
+        ok = ok and (match or args.fixed_dt is not None)
+        print(f"{path}: score {result['score']} deaths {result['deaths']} "
+              f"({result['steps']} steps in {result['wall_time'] * 1000:.1f} ms)"
+              + ("" if match else f"  MISMATCH, recorded {expected}"))
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
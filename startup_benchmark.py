@@ -0,0 +1,97 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from constants import FIRST_FRAME_ENV, FIRST_FRAME_MARKER
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+IMPORT_BUDGET_MS = 1500   # for `import app`, i.e. everything the menus need
+
+# modules that `import app` must not pull in: the game and audio stack load when a level is
+# played (see level_loader.warm_up_audio), and the profile database opens in BeatBlitzApp.build()
+DEFERRED_MODULES = ('main', 'game', 'music', 'imslib.audio', 'imslib.synth', 'pyaudio', 'fluidsynth', 'mido',
+                    'profile_store', 'level_index', 'sqlite3')
+
+def import_times(module = 'app'):
+    """
+    Imports `module` in a fresh interpreter with ``-X importtime``.
+
+    :returns: A list of ``(name, self_us, cumulative_us)``, one per imported module, in the
+        order Python reports them.
+    """
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                          cwd=HERE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'import {module} failed:\n{proc.stderr[-2000:]}')
+
+    times = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        try:
+            times.append((fields[2].strip(), int(fields[0]), int(fields[1])))
+        except (IndexError, ValueError):
+            pass   # the header line
+    return times
+
+def time_to_first_frame(timeout = 60.0):
+    """
+    Starts the game and waits for its first frame (the game quits right after it).
+
+    :returns: Seconds from launching the process to the first frame.
+    """
+    env = dict(os.environ, **{FIRST_FRAME_ENV: '1'})
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, 'app.py'], cwd=HERE, env=env,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        for line in proc.stdout:
+            if line.startswith(FIRST_FRAME_MARKER):
+                return time.perf_counter() - t0
+            if time.perf_counter() - t0 > timeout:
+                break
+    finally:
+        proc.kill()
+        proc.wait()
+    raise RuntimeError('the game did not draw a frame')
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how fast Beat Blitz starts, and check its import-time budget')
+    parser.add_argument('--budget-ms', type=float, default=IMPORT_BUDGET_MS, help='Import-time budget for app.py')
+    parser.add_argument('--top', type=int, default=15, help='How many of the slowest modules to list')
+    parser.add_argument('--runs', type=int, default=3, help='Runs to take the best of')
+    parser.add_argument('--no-window', action='store_true', help='Skip timing the first frame')
+
+    args = parser.parse_args()
+
+    # best of several runs, to leave out cold disk caches
+    runs = [import_times() for _ in range(args.runs)]
+    times = min(runs, key=lambda t: sum(self_us for _, self_us, _ in t))
+    total_ms = sum(self_us for _, self_us, _ in times) / 1000
+
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, self_us, cumulative_us in sorted(times, key=lambda t: -t[1])[:args.top]:
+        print(f"{self_us / 1000:9.1f} {cumulative_us / 1000:9.1f}  {name}")
+
+    ok = total_ms <= args.budget_ms
+    print(f"\nimport app: {total_ms:.1f} ms for {len(times)} modules (budget {args.budget_ms:.0f} ms)"
+          + ("" if ok else "  OVER BUDGET"))
+
+    imported = {name for name, _, _ in times}
+    eager = [name for name in DEFERRED_MODULES if name in imported]
+    if eager:
+        ok = False
+        print(f"imported at startup but should be deferred: {', '.join(eager)}")
+
+    if not args.no_window:
+        first_frame = min(time_to_first_frame() for _ in range(args.runs))
+        print(f"first frame: {first_frame * 1000:.0f} ms")
+
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
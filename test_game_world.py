@@ -0,0 +1,57 @@
+import pytest
+
+from constants import PHYSICS_STEP, GROUND_HEIGHT, PRACTICE_SPEEDS, SCROLL_SPEED, JUMP_STRENGTH, GRAVITY
+from game_world import GameWorld, PlayerController
+from level_model import LevelModel
+from replay import NullAudio
+
+# a level of red floor pads
+PADS = {str(i): {"type": "empty", "color": [1, 0, 0]} for i in range(40)}
+
+def run(world, player_ctrl, seconds, step):
+    top = world.player_y
+    for _ in range(int(round(seconds / step))):
+        world.on_update(step)
+        player_ctrl.on_update(step)
+        top = max(top, world.player_y)
+    return top
+
+@pytest.mark.parametrize("step", [PHYSICS_STEP, 1 / 120.0, 1 / 60.0])
+def test_jump_off_matching_pad(step):
+    world = GameWorld(LevelModel(PADS), NullAudio())
+    player_ctrl = PlayerController(world, NullAudio())
+    run(world, player_ctrl, 0.2, step)
+    assert world.color_under_player == [1, 0, 0]
+
+    # hold red for half a second: one jump, scored as correct
+    player_ctrl.on_key_down(["", "1"])
+    top = run(world, player_ctrl, 0.5, step)
+    player_ctrl.on_key_up(["", "1"])
+
+    assert top - GROUND_HEIGHT > 100
+    assert world.score == 10
+    assert not world.dead
+
+def test_land_on_pad():
+    world = GameWorld(LevelModel(PADS), NullAudio())
+    player_ctrl = PlayerController(world, NullAudio())
+    world.player_y = GROUND_HEIGHT + 100
+    run(world, player_ctrl, 0.5, PHYSICS_STEP)
+
+    assert world.player_y == GROUND_HEIGHT
+    assert world.is_on_something
+    assert world.color_under_player == [1, 0, 0]
+
+@pytest.mark.parametrize("speed", PRACTICE_SPEEDS)
+def test_practice_speed_keeps_jump_length(speed):
+    # a jump covers the same distance at every speed; it just takes longer
+    world = GameWorld(LevelModel(PADS), NullAudio(), speed)
+    player_ctrl = PlayerController(world, NullAudio())
+    player_ctrl.attempt_jump(1)
+    start_x = world.scroll_x
+    while True:
+        world.on_update(PHYSICS_STEP)
+        if world.is_on_something:
+            break
+
+    assert world.scroll_x - start_x == pytest.approx(SCROLL_SPEED * 2 * JUMP_STRENGTH / -GRAVITY, abs=10)
@@ -0,0 +1,100 @@
+import json
+import os
+
+import pytest
+
+from level_index import LevelIndex
+from profile_store import ProfileStore
+
+def write_metadata(level_dir, folder, levels, bump_ns = 0):
+    os.makedirs(os.path.join(level_dir, folder), exist_ok=True)
+    path = os.path.join(level_dir, folder, "level_metadata.json")
+    with open(path, "w") as f:
+        json.dump(levels, f)
+    if bump_ns:
+        # a later mtime than the clock may give, so the edit is seen even on coarse file systems
+        mtime_ns = os.stat(path).st_mtime_ns + bump_ns
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return path
+
+@pytest.fixture
+def reads(monkeypatch):
+    # folders of the metadata files the index reads, in order
+    opened = []
+    real_load = json.load
+    def load(f, *args, **kwargs):
+        opened.append(os.path.basename(os.path.dirname(f.name)))
+        return real_load(f, *args, **kwargs)
+    monkeypatch.setattr(json, "load", load)
+    return opened
+
+def test_rescan_reads_only_changed_files(tmp_path, reads):
+    level_dir = str(tmp_path)
+    write_metadata(level_dir, "a", {"Alpha": {"bpm": 120}})
+    write_metadata(level_dir, "b", {"Beta": {"bpm": 90}})
+    index = LevelIndex(level_dir)
+
+    levels, changed = index.scan()
+    assert changed
+    assert levels == {"Alpha": {"bpm": 120}, "Beta": {"bpm": 90}}
+    assert sorted(reads) == ["a", "b"]
+
+    # nothing changed: no file is read again
+    del reads[:]
+    levels, changed = index.scan()
+    assert not changed and reads == []
+    assert set(levels) == {"Alpha", "Beta"}
+
+    # one edit, one new file, one removal
+    write_metadata(level_dir, "a", {"Alpha": {"bpm": 140}}, bump_ns=10 ** 9)
+    write_metadata(level_dir, "c", {"Gamma": {"bpm": 100}})
+    os.remove(os.path.join(level_dir, "b", "level_metadata.json"))
+    levels, changed = index.scan()
+    assert changed
+    assert sorted(reads) == ["a", "c"]
+    assert levels == {"Alpha": {"bpm": 140}, "Gamma": {"bpm": 100}}
+
+def test_returned_levels_are_copies(tmp_path):
+    write_metadata(str(tmp_path), "a", {"Alpha": {"high_score": 0}})
+    index = LevelIndex(str(tmp_path))
+
+    levels, _ = index.scan()
+    levels["Alpha"]["high_score"] = 500
+    assert index.scan()[0]["Alpha"]["high_score"] == 0
+
+def test_last_path_wins_for_duplicate_levels(tmp_path):
+    write_metadata(str(tmp_path), "a", {"Alpha": {"bpm": 1}})
+    write_metadata(str(tmp_path), "b", {"Alpha": {"bpm": 2}})
+
+    levels, _ = LevelIndex(str(tmp_path)).scan()
+    assert levels == {"Alpha": {"bpm": 2}}
+
+def test_bad_file_is_skipped(tmp_path):
+    write_metadata(str(tmp_path), "a", {"Alpha": {"bpm": 120}})
+    os.makedirs(os.path.join(str(tmp_path), "b"))
+    with open(os.path.join(str(tmp_path), "b", "level_metadata.json"), "w") as f:
+        f.write("{not json")
+
+    levels, _ = LevelIndex(str(tmp_path)).scan()
+    assert levels == {"Alpha": {"bpm": 120}}
+
+def test_store_keeps_index_across_runs(tmp_path, reads):
+    level_dir = str(tmp_path / "levels")
+    write_metadata(level_dir, "a", {"Alpha": {"bpm": 120}})
+    write_metadata(level_dir, "b", {"Beta": {"bpm": 90}})
+    db_path = str(tmp_path / "profile.db")
+
+    store = ProfileStore(db_path)
+    LevelIndex(level_dir, store).scan()
+    store.close()
+
+    # next start: only the file changed in between is read
+    write_metadata(level_dir, "b", {"Beta": {"bpm": 95}}, bump_ns=10 ** 9)
+    del reads[:]
+    store = ProfileStore(db_path)
+    levels, changed = LevelIndex(level_dir, store).scan()
+    store.close()
+
+    assert changed
+    assert reads == ["b"]
+    assert levels == {"Alpha": {"bpm": 120}, "Beta": {"bpm": 95}}
@@ -0,0 +1,74 @@
+import numpy as np
+import pytest
+
+from constants import GROUND_HEIGHT, SLICE_WIDTH
+from level_model import LevelModel, CTYPE_NONE, CTYPE_TOP, CTYPE_BOTTOM, CTYPE_SIDE, CTYPE_SPIKE
+
+G = GROUND_HEIGHT
+PSIZE = 40
+
+# (obstacle data, player x, player y, vy) -> (class, y to snap to for top/bottom), with the
+# obstacle at slice 0. These are the answers of the per-object check_collision() methods
+# that LevelModel.classify replaced
+CASES = [
+    # floor pad, [G, G + 10]
+    ({"type": "empty"}, 0, G, 0, CTYPE_TOP, G),
+    ({"type": "empty"}, 20, G + 5, -100, CTYPE_TOP, G),
+    ({"type": "empty"}, 0, G + 10, -100, CTYPE_NONE, None),
+    ({"type": "empty"}, SLICE_WIDTH, G, 0, CTYPE_NONE, None),
+    # spikes, [G, G + 50]
+    ({"type": "spikes"}, 0, G, 0, CTYPE_SPIKE, None),
+    ({"type": "spikes"}, -30, G + 49, -100, CTYPE_SPIKE, None),
+    ({"type": "spikes"}, 0, G + 50, -100, CTYPE_NONE, None),
+    # tower, [G, G + 80]
+    ({"type": "tower", "height": 2}, 0, G + 78, -10, CTYPE_TOP, G + 80),
+    ({"type": "tower", "height": 2}, 0, G + 78, 10, CTYPE_SIDE, None),
+    ({"type": "tower", "height": 2}, -20, G, 0, CTYPE_SIDE, None),
+    ({"type": "tower", "height": 2}, 0, G + 80, -10, CTYPE_NONE, None),
+    # tower [G, G + 80] with spikes [G + 80, G + 110]: no landing on it
+    ({"type": "towerWithSpikes", "height": 2}, 0, G + 78, -10, CTYPE_SPIKE, None),
+    ({"type": "towerWithSpikes", "height": 2}, -20, G + 20, 0, CTYPE_SIDE, None),
+    ({"type": "towerWithSpikes", "height": 2}, 0, G + 100, -10, CTYPE_SPIKE, None),
+    ({"type": "towerWithSpikes", "height": 2}, 0, G + 110, -10, CTYPE_NONE, None),
+    # floating square, [G + 50, G + 90]
+    ({"type": "floatingSquare"}, 0, G + 80, -10, CTYPE_TOP, G + 90),
+    ({"type": "floatingSquare"}, 0, G + 15, 10, CTYPE_BOTTOM, G + 50),
+    ({"type": "floatingSquare"}, 0, G + 15, -10, CTYPE_SIDE, None),
+    ({"type": "floatingSquare"}, 0, G + 40, 0, CTYPE_SIDE, None),
+    ({"type": "floatingSquare"}, 0, G, 0, CTYPE_NONE, None),
+    # floating square with spikes [G + 90, G + 110] on top, or [G + 30, G + 50] below; the
+    # square itself can be passed through
+    ({"type": "floatingSquareWithSpikes"}, 0, G + 95, -10, CTYPE_SPIKE, None),
+    ({"type": "floatingSquareWithSpikes"}, 0, G + 45, 0, CTYPE_NONE, None),
+    ({"type": "floatingSquareWithSpikes", "spikesOnTop": False}, 0, G, 10, CTYPE_SPIKE, None),
+    ({"type": "floatingSquareWithSpikes", "spikesOnTop": False}, 0, G + 60, 0, CTYPE_NONE, None),
+]
+
+@pytest.mark.parametrize("data, px, py, vy, expected, snap_y", CASES)
+def test_classify(data, px, py, vy, expected, snap_y):
+    model = LevelModel({"0": data})
+    ctypes, top_ys = model.classify(px, py, PSIZE, vy)
+
+    assert ctypes[0] == expected
+    if snap_y is not None:
+        assert top_ys[0] == snap_y
+
+def test_pad_lets_rising_player_through():
+    # unlike the old Empty.check_collision, a pad does not catch a player that is jumping off it
+    model = LevelModel({"0": {"type": "empty"}})
+    ctypes, _ = model.classify(0, G + 5, PSIZE, 300)
+    assert ctypes[0] == CTYPE_NONE
+
+def test_classify_many_players():
+    model = LevelModel({str(i): data for i, (data, *_) in enumerate(CASES)})
+    px = np.array([i * SLICE_WIDTH + case[1] for i, case in enumerate(CASES)], dtype=float)
+    py = np.array([case[2] for case in CASES], dtype=float)
+    vy = np.array([case[3] for case in CASES], dtype=float)
+
+    # every player against every obstacle at once; player i only reaches obstacles i - 1 .. i + 1
+    ctypes, _ = model.classify(px[:, None], py[:, None], PSIZE, vy[:, None])
+    assert ctypes.shape == (len(CASES), len(CASES))
+    for i, case in enumerate(CASES):
+        hits = model.indices_in(px[i], px[i] + PSIZE)
+        assert ctypes[i, i] == case[4]
+        assert not ctypes[i, :hits.start].any() and not ctypes[i, hits.stop:].any()
@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from persistence import DebouncedWriter
+
+class Recorder(object):
+    def __init__(self):
+        self.writes = []
+        self.threads = set()
+
+    def __call__(self, key, value):
+        self.threads.add(threading.current_thread())
+        if key == "bad":
+            raise ValueError("disk full")
+        self.writes.append((key, value))
+
+def test_saves_coalesce_between_writes():
+    rec = Recorder()
+    writer = DebouncedWriter(rec, min_interval = 60.0)
+    writer.save("scores", 1)
+    assert writer.flush(wait = True)
+    assert rec.writes == [("scores", 1)]
+
+    # within the interval: nothing is written, and only the latest value per key is kept
+    writer.save("scores", 2)
+    writer.save("run", "a")
+    writer.save("scores", 3)
+    time.sleep(0.1)
+    assert rec.writes == [("scores", 1)]
+
+    assert writer.flush(wait = True)
+    assert rec.writes == [("scores", 1), ("scores", 3), ("run", "a")]
+    assert threading.current_thread() not in rec.threads
+    writer.close()
+
+def test_writes_after_interval_without_flush():
+    rec = Recorder()
+    writer = DebouncedWriter(rec, min_interval = 0.1)
+    writer.save("scores", 1)
+    writer.flush(wait = True)
+    writer.save("scores", 2)
+
+    deadline = time.monotonic() + 5.0
+    while len(rec.writes) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert rec.writes == [("scores", 1), ("scores", 2)]
+    writer.close()
+
+def test_close_writes_pending_and_stops():
+    rec = Recorder()
+    writer = DebouncedWriter(rec, min_interval = 60.0)
+    writer.save("scores", 1)
+    writer.flush(wait = True)
+    writer.save("scores", 2)
+    writer.close()
+
+    assert rec.writes == [("scores", 1), ("scores", 2)]
+    assert not writer.thread.is_alive()
+    with pytest.raises(RuntimeError):
+        writer.save("scores", 3)
+
+def test_failed_write_does_not_stop_writer():
+    rec = Recorder()
+    writer = DebouncedWriter(rec, min_interval = 0.0)
+    writer.save("bad", 1)
+    writer.save("scores", 1)
+    assert writer.flush(wait = True)
+    writer.save("scores", 2)
+    writer.close()
+
+    assert rec.writes == [("scores", 1), ("scores", 2)]
@@ -0,0 +1,105 @@
+import os
+import wave
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyaudio")   # imslib.audio, which wavesrc needs for Audio.sample_rate
+
+from imslib.audio import Audio
+import imslib.wavesrc
+from imslib.wavesrc import SampleCache, WaveFile, resample
+
+def write_wave(path, samples, num_channels = 1, sr = Audio.sample_rate, sampwidth = 2):
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(num_channels)
+        f.setsampwidth(sampwidth)
+        f.setframerate(sr)
+        if sampwidth == 3:
+            f.writeframes(np.asarray(samples, dtype='<i4').view(np.uint8).reshape(-1, 4)[:, :3].tobytes())
+        else:
+            f.writeframes(np.asarray(samples, dtype='<i2').tobytes())
+    return str(path)
+
+def tones(sr, seconds = 0.25):
+    # a 1kHz sine on the left channel and a quieter 3kHz cosine on the right
+    t = np.arange(int(sr * seconds))[:, None] / sr
+    return np.hstack((np.sin(2 * np.pi * 1000 * t), 0.5 * np.cos(2 * np.pi * 3000 * t)))
+
+@pytest.fixture
+def wave_path(tmp_path):
+    return write_wave(tmp_path / 'ramp.wav', np.arange(1000) * 16)
+
+def test_sample_cache_shares_regions(wave_path):
+    cache = SampleCache()
+    data, num_channels = cache.get(wave_path, 100, 50)
+    again, _ = cache.get(wave_path, 100, 50)
+
+    assert num_channels == 1
+    assert again is data
+    assert not data.flags.writeable
+    assert np.allclose(data, np.arange(100, 150) * 16 / 32768.0)
+    assert cache.get_stats()['hits'] == 1 and cache.get_stats()['misses'] == 1
+
+def test_sample_cache_evicts_least_recently_used(wave_path):
+    region_bytes = 100 * 4
+    cache = SampleCache(max_bytes = 2 * region_bytes)
+    a, _ = cache.get(wave_path, 0, 100)
+    cache.get(wave_path, 100, 100)
+    cache.get(wave_path, 0, 100)      # a is now the most recently used
+    cache.get(wave_path, 200, 100)    # over budget: drops the region at 100
+
+    assert cache.get_stats()['entries'] == 2
+    assert cache.num_bytes == 2 * region_bytes
+    assert cache.get(wave_path, 0, 100)[0] is a
+    misses = cache.misses
+    cache.get(wave_path, 100, 100)
+    assert cache.misses == misses + 1
+
+    cache.set_budget(region_bytes)
+    assert cache.get_stats()['entries'] == 1
+    assert cache.num_bytes <= region_bytes
+
+def test_sample_cache_rereads_changed_file(wave_path, tmp_path):
+    cache = SampleCache()
+    old, _ = cache.get(wave_path, 0, 10)
+    mtime_ns = os.stat(wave_path).st_mtime_ns
+    write_wave(tmp_path / 'ramp.wav', -np.arange(1000))
+    os.utime(wave_path, ns = (mtime_ns + 10 ** 9, mtime_ns + 10 ** 9))   # in case the clock is coarse
+    new, _ = cache.get(wave_path, 0, 10)
+
+    assert new is not old
+    assert np.allclose(new, -np.arange(10) / 32768.0)
+
+@pytest.mark.parametrize("sr_in", [22050, 32000, 48000, 96000])
+def test_resample_matches_signal(sr_in):
+    out = resample(tones(sr_in), sr_in, Audio.sample_rate)
+    expected = tones(Audio.sample_rate)
+
+    assert out.dtype == np.float32
+    assert out.shape == (-(-len(tones(sr_in)) * Audio.sample_rate // sr_in), 2)
+    # the filter needs a few taps of context, so leave out the edges
+    n = min(len(out), len(expected))
+    assert np.abs(out[64:n - 64] - expected[64:n - 64]).max() < 1e-3
+
+def test_resample_removes_aliases():
+    # 30kHz is above the Nyquist frequency of 44.1kHz: it must be filtered out, not folded down
+    t = np.arange(96000 // 4)[:, None] / 96000
+    out = resample(np.sin(2 * np.pi * 30000 * t), 96000, Audio.sample_rate)
+    assert np.abs(out[64:-64]).max() < 1e-3
+
+def test_resample_same_rate_is_unchanged():
+    data = tones(Audio.sample_rate).astype(np.float32)
+    assert np.array_equal(resample(data, Audio.sample_rate, Audio.sample_rate), data)
+
+def test_wave_file_converts_24_bit_48k(tmp_path, monkeypatch):
+    monkeypatch.setattr(imslib.wavesrc, 'get_cache_dir', lambda: str(tmp_path / 'cache'))
+    samples = np.round(tones(48000) * (2 ** 23 - 1)).astype(np.int32)
+    path = write_wave(tmp_path / 'tones.wav', samples, num_channels = 2, sr = 48000, sampwidth = 3)
+
+    wf = WaveFile(path)
+    frames = wf.get_frames(1000, 2000).reshape(-1, 2)
+
+    assert wf.get_num_channels() == 2
+    assert np.abs(frames - tones(Audio.sample_rate)[1000:3000]).max() < 1e-3
+    assert len(os.listdir(tmp_path / 'cache' / 'wavecache')) == 1
@@ -0,0 +1,32 @@
+import argparse
+import json
+
+from imslib.sf2 import build_subset, get_cached_fluidbank
+from music import level_presets
+
+def trim_levels(midi_files, soundfont=None):
+    """Build the trimmed SoundFont for each level's midi_data.json and return their paths."""
+    if soundfont is None:
+        soundfont = get_cached_fluidbank()
+
+    paths = []
+    for midi_file in midi_files:
+        with open(midi_file, 'r') as f:
+            midi_data = json.load(f)
+        presets = level_presets(midi_data)
+        path = build_subset(presets, soundfont)
+        print(f"{midi_file}: {len(presets)} presets -> {path}")
+        paths.append(path)
+    return paths
+
+def main():
+    parser = argparse.ArgumentParser(description='Build trimmed SoundFonts holding only the presets each level uses')
+    parser.add_argument('midi_files', nargs='+', help='Paths to level midi_data.json files')
+    parser.add_argument('--soundfont', help='Source .sf2 file (default: cached FluidR3_GM.sf2)')
+
+    args = parser.parse_args()
+
+    trim_levels(args.midi_files, args.soundfont)
+
+if __name__ == "__main__":
+    main()